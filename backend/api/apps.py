@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from api import catalog, counts, events, snapshots
+
+        catalog.connect_signals()
+        counts.connect_signals()
+        events.connect_signals()
+        snapshots.connect_signals()
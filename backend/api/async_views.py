@@ -0,0 +1,438 @@
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import APIException, NotFound, Throttled
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from api import events
+from api.catalog import get_catalog
+from api.counts import cached_count
+from api.conditional import (get_recipe_version, recipe_not_modified,
+                             remember_viewer_flags, set_recipe_validators)
+from api.fields import (FieldSelection, optimize_recipe_queryset,
+                        rendered_viewer_flags)
+from api.filters import filter_recipe_queryset, order_recipe_queryset
+from api.pagination import CustomPagination
+from api.search import fuzzy_ingredients
+from api.serializers import RecipeOutputSerializer, UserSerializer
+from api.throttling import ScopedBucketThrottle
+from api.viewer import FAVORITES, SHOPPING_CART, SUBSCRIPTIONS, get_viewer
+from api.views import (IngredientViewSet, RecipeViewSet, TagViewSet,
+                       UserProfileView)
+from foodgram_backend.profiling import profiled_thread
+from recipes.counters import recipe_views
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def database_sync_to_async(func):
+    """
+    Выполняет синхронный код с ORM в пуле потоков, чтобы независимые
+    запросы к базе шли параллельно, каждый на своём соединении.
+    """
+    def inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            with profiled_thread():
+                return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(inner, thread_sensitive=False)
+
+
+def render(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(
+        JSONRenderer().render(data),
+        status=status_code,
+        content_type='application/json'
+    )
+
+
+def async_read_view(handler, fallback, throttle_scope='read'):
+    """
+    Асинхронное представление для GET/HEAD, остальные методы
+    передаются синхронному DRF-представлению. Обработчик получает
+    DRF Request после аутентификации и проверки частоты запросов.
+    """
+    fallback = sync_to_async(fallback)
+
+    async def view(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return await fallback(request, *args, **kwargs)
+        try:
+            request = await authenticate(request, throttle_scope)
+            return await handler(request, *args, **kwargs)
+        except APIException as exc:
+            response = render({'detail': exc.detail}, exc.status_code)
+            if getattr(exc, 'wait', None):
+                response['Retry-After'] = '%d' % exc.wait
+            return response
+
+    view.csrf_exempt = True
+    return view
+
+
+@database_sync_to_async
+def authenticate(request, throttle_scope):
+    """
+    Аутентификация и проверка частоты запросов. Проверка ждёт
+    блокировку fcntl общего файла, поэтому тоже идёт в пуле потоков,
+    а не в цикле событий.
+    """
+    drf_request = Request(
+        request,
+        authenticators=[
+            auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        ]
+    )
+    drf_request.user
+    throttle = ScopedBucketThrottle()
+    if not throttle.check(drf_request, throttle_scope):
+        raise Throttled(throttle.wait())
+    return drf_request
+
+
+def values_set(queryset):
+    return database_sync_to_async(lambda: set(queryset))()
+
+
+async def empty_set():
+    return set()
+
+
+def viewer_flags(user, recipes, authors, kinds):
+    """
+    Флаги пользователя только по рецептам и авторам страницы и только
+    те, что попадут в ответ.
+    """
+    if user.is_anonymous:
+        return empty_set(), empty_set(), empty_set()
+    return (
+        values_set(Favorite.objects.filter(
+            user=user, recipe__in=recipes
+        ).values_list('recipe_id', flat=True))
+        if FAVORITES in kinds else empty_set(),
+        values_set(ShoppingCart.objects.filter(
+            user=user, recipe__in=recipes
+        ).values_list('recipe_id', flat=True))
+        if SHOPPING_CART in kinds else empty_set(),
+        values_set(Subscription.objects.filter(
+            user=user, author__in=authors
+        ).values_list('author_id', flat=True))
+        if SUBSCRIPTIONS in kinds else empty_set(),
+    )
+
+
+def remember_page_flags(request, recipes, kinds, favorites, shopping_cart,
+                        subscriptions):
+    viewer = get_viewer(request)
+    if FAVORITES in kinds:
+        viewer.remember(FAVORITES, {
+            recipe.id: recipe.id in favorites for recipe in recipes})
+    if SHOPPING_CART in kinds:
+        viewer.remember(SHOPPING_CART, {
+            recipe.id: recipe.id in shopping_cart for recipe in recipes})
+    if SUBSCRIPTIONS in kinds:
+        viewer.remember(SUBSCRIPTIONS, {
+            recipe.author_id: recipe.author_id in subscriptions
+            for recipe in recipes})
+
+
+def recipe_queryset(selection=None):
+    return optimize_recipe_queryset(Recipe.objects.all(), selection)
+
+
+async def recipe_list(request):
+    paginator = CustomPagination()
+    page_size = paginator.get_page_size(request)
+    try:
+        page_number = int(request.query_params.get(
+            paginator.page_query_param, 1))
+    except ValueError:
+        raise NotFound(paginator.invalid_page_message)
+    if page_number < 1:
+        raise NotFound(paginator.invalid_page_message)
+
+    queryset = filter_recipe_queryset(
+        order_recipe_queryset(Recipe.objects.all(), request.query_params),
+        request.query_params, request.user)
+    offset = (page_number - 1) * page_size
+    page = queryset[offset:offset + page_size]
+    page_ids = page.values('id')
+    selection = FieldSelection.from_request(request)
+    kinds = rendered_viewer_flags(selection)
+    favorites, shopping_cart, subscriptions = viewer_flags(
+        request.user, page_ids, page.values('author_id'), kinds)
+
+    # count из кэша может отставать или быть оценкой, поэтому наличие
+    # следующей страницы проверяется отдельно.
+    count, has_next, recipes, favorites, shopping_cart, subscriptions = (
+        await asyncio.gather(
+            database_sync_to_async(cached_count)(queryset, estimate=True),
+            database_sync_to_async(
+                queryset[offset + page_size:].exists)(),
+            database_sync_to_async(list)(order_recipe_queryset(
+                recipe_queryset(selection).filter(id__in=page_ids),
+                request.query_params)),
+            favorites, shopping_cart, subscriptions,
+        )
+    )
+    if not recipes and page_number != 1:
+        raise NotFound(paginator.invalid_page_message)
+    if has_next:
+        count = max(count, offset + page_size + 1)
+    else:
+        count = offset + len(recipes)
+
+    remember_page_flags(
+        request, recipes, kinds, favorites, shopping_cart, subscriptions)
+    results = await database_sync_to_async(
+        lambda: RecipeOutputSerializer(recipes, many=True, context={
+            'request': request,
+            'field_selection': selection,
+        }).data
+    )()
+
+    url = request.build_absolute_uri()
+    next_link = previous_link = None
+    if has_next:
+        next_link = replace_query_param(
+            url, paginator.page_query_param, page_number + 1)
+    if page_number == 2:
+        previous_link = remove_query_param(url, paginator.page_query_param)
+    elif page_number > 2:
+        previous_link = replace_query_param(
+            url, paginator.page_query_param, page_number - 1)
+    return render({
+        'count': count,
+        'next': next_link,
+        'previous': previous_link,
+        'results': results,
+    })
+
+
+async def recipe_detail(request, pk):
+    version = await database_sync_to_async(get_recipe_version)(
+        pk, request.user)
+    if version is None:
+        raise NotFound()
+    recipe_views.add(version['id'])
+    not_modified = recipe_not_modified(request, version)
+    if not_modified is not None:
+        return not_modified
+
+    selection = FieldSelection.from_request(request)
+    recipe = await database_sync_to_async(
+        recipe_queryset(selection).filter(pk=pk).first)()
+    if recipe is None:
+        raise NotFound()
+
+    remember_viewer_flags(request, version)
+    return set_recipe_validators(render(await database_sync_to_async(
+        lambda: RecipeOutputSerializer(recipe, context={
+            'request': request,
+            'field_selection': selection,
+        }).data
+    )()), version)
+
+
+def catalog_response(content):
+    return HttpResponse(content, content_type='application/json')
+
+
+# Сегмент обычно уже отображён, но при первом обращении может
+# собираться из базы, поэтому запрашивается вне цикла событий.
+current_catalog = sync_to_async(get_catalog, thread_sensitive=False)
+
+
+async def ingredient_list(request):
+    catalog = await current_catalog()
+    name_filter = request.query_params.get('name')
+    if name_filter and request.query_params.get('fuzzy') in ('1', 'true'):
+        return catalog_response(await database_sync_to_async(
+            fuzzy_ingredients)(catalog, name_filter))
+    if name_filter:
+        return catalog_response(catalog.ingredients.search(name_filter))
+    return catalog_response(catalog.ingredients.json)
+
+
+async def tag_list(request):
+    return catalog_response((await current_catalog()).tags.json)
+
+
+async def user_profile(request, id):
+    if request.user.is_authenticated:
+        subscriptions = values_set(Subscription.objects.filter(
+            user=request.user, author_id=id
+        ).values_list('author_id', flat=True))
+    else:
+        subscriptions = empty_set()
+
+    user, subscriptions = await asyncio.gather(
+        database_sync_to_async(User.objects.filter(id=id).first)(),
+        subscriptions,
+    )
+    if user is None:
+        raise NotFound()
+
+    get_viewer(request).remember(
+        SUBSCRIPTIONS, {user.id: user.id in subscriptions})
+    return render(UserSerializer(user, context={
+        'request': request,
+    }).data)
+
+
+recipe_list_view = async_read_view(
+    recipe_list,
+    RecipeViewSet.as_view({'get': 'list', 'post': 'create'})
+)
+recipe_detail_view = async_read_view(
+    recipe_detail,
+    RecipeViewSet.as_view({
+        'get': 'retrieve',
+        'put': 'update',
+        'patch': 'partial_update',
+        'delete': 'destroy',
+    })
+)
+ingredient_list_view = async_read_view(
+    ingredient_list, IngredientViewSet.as_view({'get': 'list'}),
+    throttle_scope='search')
+tag_list_view = async_read_view(
+    tag_list, TagViewSet.as_view({'get': 'list'}))
+user_profile_view = async_read_view(user_profile, UserProfileView.as_view())
+
+
+@database_sync_to_async
+def open_stream(scope):
+    """
+    Пользователь по токену из заголовка Authorization или по билету
+    ?ticket= (events.issue_ticket), его подписки и рецепты, пропущенные
+    с Last-Event-ID. Для просроченного билета - events.TicketExpired.
+    Читается из основной базы: реплика может отставать, и рецепт, о
+    котором клиент ещё не знает, не попал бы в досылку.
+    """
+    headers = dict(scope['headers'])
+    key = headers.get(b'authorization', b'').decode('latin-1')
+    tokens = Token.objects.using('default').filter(user__is_active=True)
+    if key.startswith('Token '):
+        token = tokens.filter(key=key[len('Token '):]).first()
+    else:
+        ticket = parse_qs(scope['query_string'].decode()).get('ticket', [''])
+        payload = events.read_ticket(ticket[0])
+        token = None
+        if payload is not None:
+            user_id, digest = payload
+            token = tokens.filter(user_id=user_id).first()
+            if token is not None and events.token_digest(
+                    token.key) != digest:
+                token = None
+    if token is None:
+        return None
+    user_id = token.user_id
+    authors = list(Subscription.objects.using('default').filter(
+        user_id=user_id).values_list('author_id', flat=True))
+    missed = []
+    last_id = headers.get(b'last-event-id', b'').decode('latin-1')
+    if last_id.isdigit() and authors:
+        missed = [
+            {'type': events.RECIPE_EVENT, 'id': pk, 'author': author,
+             'name': name}
+            for pk, author, name in Recipe.objects.using('default').filter(
+                author_id__in=authors, id__gt=int(last_id)
+            ).order_by('id').values_list(
+                'id', 'author_id', 'name')[:settings.EVENTS_REPLAY_LIMIT]
+        ]
+    return user_id, authors, missed
+
+
+async def send_json(send, status_code, data):
+    await send({
+        'type': 'http.response.start',
+        'status': status_code,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': json.dumps(data, ensure_ascii=False).encode(),
+    })
+
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def events_app(scope, receive, send):
+    """
+    GET /api/events/: поток server-sent events о новых рецептах
+    авторов, на которых подписан пользователь. Раз в
+    EVENTS_HEARTBEAT секунд отправляется комментарий, чтобы прокси
+    не закрывали простаивающее соединение. Ответ 204 на просроченный
+    билет закрывает EventSource: клиент берёт новый билет и открывает
+    поток заново с Last-Event-ID последнего события.
+    """
+    if scope['method'] != 'GET':
+        return await send_json(send, status.HTTP_405_METHOD_NOT_ALLOWED, {
+            'detail': f'Метод "{scope["method"]}" не разрешен.'})
+    try:
+        stream = await open_stream(scope)
+    except events.TicketExpired:
+        # EventSource закрывается и на 204, и на 401; 204 значит
+        # «получите новый билет в /api/events/ticket/ и подключитесь».
+        await send({'type': 'http.response.start',
+                    'status': status.HTTP_204_NO_CONTENT, 'headers': []})
+        return await send({'type': 'http.response.body', 'body': b''})
+    if stream is None:
+        return await send_json(send, status.HTTP_401_UNAUTHORIZED, {
+            'detail': 'Учетные данные не были предоставлены.'})
+    user_id, authors, missed = stream
+    client = events.Client(user_id, authors)
+    await send({
+        'type': 'http.response.start',
+        'status': status.HTTP_200_OK,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    chunks = [f'retry: {events.RETRY_MILLISECONDS}\n\n']
+    chunks.extend(events.format_event(event) for event in missed)
+    await send({'type': 'http.response.body',
+                'body': ''.join(chunks).encode(), 'more_body': True})
+    events.broker.add(client)
+    disconnect = asyncio.ensure_future(wait_disconnect(receive))
+    try:
+        while not disconnect.done() and not client.overflow:
+            get = asyncio.ensure_future(client.queue.get())
+            await asyncio.wait(
+                {get, disconnect}, timeout=settings.EVENTS_HEARTBEAT,
+                return_when=asyncio.FIRST_COMPLETED)
+            if get.done():
+                body = events.format_event(get.result())
+            else:
+                get.cancel()
+                body = ': ping\n\n'
+            if not disconnect.done():
+                await send({'type': 'http.response.body',
+                            'body': body.encode(), 'more_body': True})
+    finally:
+        events.broker.remove(client)
+        closed = disconnect.done()
+        disconnect.cancel()
+    if not closed:
+        await send({'type': 'http.response.body', 'body': b''})
@@ -0,0 +1,97 @@
+import asyncio
+import copy
+import json
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync
+from django.http import QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from api.serializers import BatchSerializer
+from api.viewer import get_viewer
+from foodgram_backend.profiling import ProfiledViewMixin
+
+# Заголовки подответов, которые нужны клиенту для кэширования и
+# повторов; остальные не передаются.
+FORWARDED_HEADERS = ('ETag', 'Last-Modified', 'Retry-After')
+DROPPED_META = ('CONTENT_LENGTH', 'CONTENT_TYPE', 'HTTP_IF_NONE_MATCH',
+                'HTTP_IF_MODIFIED_SINCE')
+
+
+def build_subrequest(request, url, viewer, auth=None):
+    """
+    GET-запрос к url на основе исходного: аутентификация уже пройдена
+    и передаётся через _force_auth_user, снимок пользователя общий.
+    """
+    parts = urlsplit(url)
+    subrequest = copy.copy(request)
+    for attribute in ('_post', '_files', '_body', 'resolver_match',
+                      'content_type', 'content_params'):
+        subrequest.__dict__.pop(attribute, None)
+    subrequest.method = 'GET'
+    subrequest.path = subrequest.path_info = parts.path
+    subrequest.META = {
+        key: value for key, value in request.META.items()
+        if key not in DROPPED_META
+    }
+    subrequest.META.update(
+        REQUEST_METHOD='GET', PATH_INFO=parts.path, QUERY_STRING=parts.query)
+    subrequest.GET = QueryDict(parts.query)
+    subrequest.viewer = viewer
+    if viewer.user.is_authenticated:
+        subrequest._force_auth_user = viewer.user
+        subrequest._force_auth_token = auth
+    return subrequest
+
+
+def run_subrequest(subrequest):
+    try:
+        match = resolve(subrequest.path_info)
+    except Resolver404:
+        return {'status': status.HTTP_404_NOT_FOUND,
+                'body': {'detail': 'Страница не найдена.'}}
+    subrequest.resolver_match = match
+    view = match.func
+    if asyncio.iscoroutinefunction(view):
+        view = async_to_sync(view)
+    response = view(subrequest, *match.args, **match.kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    result = {'status': response.status_code}
+    headers = {name: response[name] for name in FORWARDED_HEADERS
+               if response.has_header(name)}
+    if headers:
+        result['headers'] = headers
+    content_type = response.get('Content-Type', '')
+    if content_type.startswith('application/json'):
+        result['body'] = json.loads(response.content or b'null')
+    else:
+        result['body'] = response.content.decode(response.charset)
+    return result
+
+
+class BatchView(ProfiledViewMixin, APIView):
+    """
+    POST /api/batch/ с {"requests": [{"url": "/api/..."}, ...]}: GET-
+    подзапросы выполняются в этом же процессе существующими
+    представлениями, ответы возвращаются списком в том же порядке.
+    """
+    permission_classes = [AllowAny]
+    # Только чтение: ReplicaPinningMiddleware не закрепляет клиента за
+    # основной базой и направляет подзапросы по его cookie.
+    read_only = True
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        viewer = get_viewer(request)
+        responses = [
+            run_subrequest(build_subrequest(
+                request._request, item['url'], viewer, request.auth))
+            for item in serializer.validated_data['requests']
+        ]
+        return Response({'responses': responses})
@@ -0,0 +1,266 @@
+import atexit
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework.renderers import JSONRenderer
+
+from recipes.models import Ingredient, Tag
+
+# Сегмент каталога - файл в общей памяти, который все воркеры
+# отображают только на чтение. Раскладка (little-endian):
+#   заголовок: MAGIC, версия, затем по секции на ингредиенты и теги;
+#   секция: JSON-массив объектов, таблица элементов в порядке выдачи
+#   (id, смещение и длина JSON, смещение и длина имени в нижнем
+#   регистре), позиции элементов по возрастанию id и блок имён.
+# Файл не меняется на месте: новая версия пишется рядом и подменяется
+# os.replace, старое отображение живёт, пока на него есть ссылки.
+MAGIC = b'FGCAT001'
+HEADER = struct.Struct('<8sQ')
+SECTION = struct.Struct('<QQQQQQQ')
+ITEM = struct.Struct('<qIIII')
+POSITION = struct.Struct('<I')
+SECTIONS = ('ingredients', 'tags')
+
+
+class CatalogSection:
+    def __init__(self, buffer, count, json_offset, json_length,
+                 items_offset, ids_offset, names_offset, names_length):
+        self.count = count
+        self.json = buffer[json_offset:json_offset + json_length]
+        self._items = buffer[items_offset:items_offset + count * ITEM.size]
+        self._ids = buffer[ids_offset:ids_offset + count * POSITION.size]
+        self._names = buffer[names_offset:names_offset + names_length]
+
+    def _item(self, position):
+        return ITEM.unpack_from(self._items, position * ITEM.size)
+
+    def _name(self, position):
+        _, _, _, start, length = self._item(position)
+        return str(self._names[start:start + length], 'utf-8')
+
+    def _position(self, pk):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            position = POSITION.unpack_from(
+                self._ids, middle * POSITION.size)[0]
+            item_id = self._item(position)[0]
+            if item_id == pk:
+                return position
+            if item_id < pk:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def __contains__(self, pk):
+        return self._position(pk) is not None
+
+    def get(self, pk):
+        """JSON объекта по id или None."""
+        position = self._position(pk)
+        if position is None:
+            return None
+        _, start, length, _, _ = self._item(position)
+        return self.json[start:start + length]
+
+    def _bisect(self, prefix, upper):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            name = self._name(middle)
+            if upper:
+                before = name < prefix or name.startswith(prefix)
+            else:
+                before = name < prefix
+            if before:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def prefix_range(self, prefix):
+        """Позиции [first, last) объектов с именем на prefix."""
+        prefix = prefix.lower()
+        return (self._bisect(prefix, upper=False),
+                self._bisect(prefix, upper=True))
+
+    def span(self, first, last):
+        """JSON объектов с позиций [first, last) через запятую."""
+        if first == last:
+            return b''
+        start = self._item(first)[1]
+        _, last_start, last_length, _, _ = self._item(last - 1)
+        return self.json[start:last_start + last_length]
+
+    def ids(self, first=0, last=None):
+        last = self.count if last is None else last
+        return [self._item(position)[0] for position in range(first, last)]
+
+    def names(self):
+        """Имена в нижнем регистре в порядке выдачи."""
+        return [self._name(position) for position in range(self.count)]
+
+    def search(self, prefix):
+        """JSON-массив объектов, имя которых начинается с prefix."""
+        return b'[' + self.span(*self.prefix_range(prefix)) + b']'
+
+
+class Catalog:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._map)
+        magic, self.version = HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError(f'{path} не является сегментом каталога')
+        for index, name in enumerate(SECTIONS):
+            setattr(self, name, CatalogSection(buffer, *SECTION.unpack_from(
+                buffer, HEADER.size + index * SECTION.size)))
+
+
+def pack_section(objects, serializer_class, name_field):
+    renderer = JSONRenderer()
+    rendered = [
+        (obj.pk, renderer.render(serializer_class(obj).data),
+         getattr(obj, name_field).lower().encode())
+        for obj in objects
+    ]
+    rendered.sort(key=lambda item: (item[2].decode(), item[0]))
+    items, json_parts, names = [], [], []
+    json_position, name_position = 1, 0
+    for pk, data, name in rendered:
+        items.append(ITEM.pack(
+            pk, json_position, len(data), name_position, len(name)))
+        json_parts.append(data)
+        names.append(name)
+        json_position += len(data) + 1
+        name_position += len(name)
+    ids = sorted(range(len(rendered)), key=lambda index: rendered[index][0])
+    return (
+        len(rendered),
+        b'[' + b','.join(json_parts) + b']',
+        b''.join(items),
+        b''.join(POSITION.pack(position) for position in ids),
+        b''.join(names),
+    )
+
+
+def build_catalog(path=None):
+    """Собирает сегмент из базы и атомарно подменяет им текущий."""
+    from api.serializers import IngredientSerializer, TagSerializer
+
+    path = path or settings.CATALOG_SEGMENT_PATH
+    sections = (
+        pack_section(Ingredient.objects.all(), IngredientSerializer, 'name'),
+        pack_section(Tag.objects.all(), TagSerializer, 'name'),
+    )
+    offset = HEADER.size + SECTION.size * len(sections)
+    headers, blobs = [], []
+    for count, *parts in sections:
+        offsets = []
+        for part in parts:
+            offsets.append((offset, len(part)))
+            blobs.append(part)
+            offset += len(part)
+        (json_offset, json_length), (items_offset, _), (ids_offset, _), (
+            names_offset, names_length) = offsets
+        headers.append(SECTION.pack(
+            count, json_offset, json_length, items_offset, ids_offset,
+            names_offset, names_length))
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, time.time_ns()))
+            f.writelines(headers)
+            f.writelines(blobs)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    reload_catalog()
+
+
+_lock = threading.Lock()
+_state = {'catalog': None, 'stat': None, 'checked_at': 0.0, 'timer': None}
+
+
+def reload_catalog():
+    _state['checked_at'] = 0.0
+
+
+def get_catalog():
+    """
+    Текущий сегмент каталога. Подмена файла замечается не позже чем
+    через CATALOG_CHECK_INTERVAL; если сегмента ещё нет, он собирается.
+    """
+    now = time.monotonic()
+    if (_state['catalog'] is not None
+            and now - _state['checked_at'] < settings.CATALOG_CHECK_INTERVAL):
+        return _state['catalog']
+    with _lock:
+        path = settings.CATALOG_SEGMENT_PATH
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            build_catalog(path)
+            stat = os.stat(path)
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if _state['catalog'] is None or _state['stat'] != key:
+            _state['catalog'] = Catalog(path)
+            _state['stat'] = key
+        _state['checked_at'] = now
+        return _state['catalog']
+
+
+def _rebuild():
+    with _lock:
+        _state['timer'] = None
+    try:
+        build_catalog()
+    finally:
+        connections.close_all()
+
+
+def schedule_rebuild(**kwargs):
+    """
+    Пересборка после изменения ингредиентов или тегов. Изменения за
+    CATALOG_REBUILD_DELAY собираются в одну пересборку.
+    """
+    def start():
+        with _lock:
+            if _state['timer'] is not None:
+                return
+            timer = threading.Timer(settings.CATALOG_REBUILD_DELAY, _rebuild)
+            timer.daemon = True
+            _state['timer'] = timer
+        timer.start()
+
+    transaction.on_commit(start)
+
+
+def flush_rebuild():
+    with _lock:
+        timer, _state['timer'] = _state['timer'], None
+    if timer is not None:
+        timer.cancel()
+        build_catalog()
+
+
+def connect_signals():
+    for model in (Ingredient, Tag):
+        post_save.connect(schedule_rebuild, sender=model,
+                          dispatch_uid=f'catalog_save_{model.__name__}')
+        post_delete.connect(schedule_rebuild, sender=model,
+                            dispatch_uid=f'catalog_delete_{model.__name__}')
+
+
+atexit.register(flush_rebuild)
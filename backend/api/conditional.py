@@ -0,0 +1,82 @@
+from django.db.models import Exists, OuterRef
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from api.viewer import FAVORITES, SHOPPING_CART, SUBSCRIPTIONS, get_viewer
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription
+
+VIEWER_FLAGS = ('is_favorited', 'is_in_shopping_cart', 'is_subscribed')
+
+
+def get_recipe_version(pk, user):
+    """
+    Лёгкий запрос версии рецепта: время изменения рецепта и его автора
+    (имя и аватар входят в ответ) и, для авторизованного пользователя,
+    его флаги по рецепту и автору.
+    """
+    queryset = Recipe.objects.filter(pk=pk)
+    fields = ['id', 'author_id', 'updated_at', 'author__updated_at']
+    if user.is_authenticated:
+        queryset = queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_subscribed=Exists(Subscription.objects.filter(
+                user=user, author=OuterRef('author'))),
+        )
+        fields.extend(VIEWER_FLAGS)
+    return queryset.values(*fields).first()
+
+
+def timestamp_us(value):
+    return int(value.timestamp() * 1e6)
+
+
+def recipe_etag(version):
+    etag = (f'{version["id"]}-{timestamp_us(version["updated_at"])}-'
+            f'{timestamp_us(version["author__updated_at"])}')
+    if 'is_favorited' in version:
+        etag += '-' + ''.join(
+            str(int(version[flag])) for flag in VIEWER_FLAGS)
+    return quote_etag(etag)
+
+
+def recipe_last_modified(version):
+    if 'is_favorited' in version:
+        return None
+    return int(max(version['updated_at'],
+                   version['author__updated_at']).timestamp())
+
+
+def recipe_not_modified(request, version):
+    response = get_conditional_response(
+        request,
+        etag=recipe_etag(version),
+        last_modified=recipe_last_modified(version),
+    )
+    if response is not None:
+        set_recipe_validators(response, version)
+    return response
+
+
+def set_recipe_validators(response, version):
+    response['ETag'] = recipe_etag(version)
+    last_modified = recipe_last_modified(version)
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+def remember_viewer_flags(request, version):
+    """Передаёт флаги из запроса версии в снимок пользователя."""
+    if 'is_favorited' not in version:
+        return
+    viewer = get_viewer(request)
+    viewer.remember(FAVORITES, {version['id']: version['is_favorited']})
+    viewer.remember(
+        SHOPPING_CART, {version['id']: version['is_in_shopping_cart']})
+    viewer.remember(
+        SUBSCRIPTIONS, {version['author_id']: version['is_subscribed']})
@@ -4,3 +4,8 @@ FIRST_NAME_MAX_LENGTH = 150
 LAST_NAME_MAX_LENGTH = 150
 MIN_AMOUNT = 1
 MAX_AMOUNT = 32000
+FUZZY_SEARCH_LIMIT = 20
+TRIGRAM_SIMILARITY_THRESHOLD = 0.3
+BATCH_MAX_REQUESTS = 10
+BATCH_MAX_COST = 30
+BATCH_URL_MAX_LENGTH = 2048
@@ -0,0 +1,137 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils.functional import cached_property
+
+from foodgram_backend.paginators import estimated_count
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+VERSION = struct.Struct('<Q')
+# Таблицы, по которым считаются страницы списков. Запись в любую из
+# них меняет её версию и тем самым ключи кэша всех COUNT с её участием.
+VERSIONED_MODELS = (Recipe, Favorite, ShoppingCart, User, Subscription)
+
+
+class TableVersions:
+    """
+    Счётчики изменений таблиц в файле, отображённом в память всех
+    воркеров. Новый файл заполняется текущим временем, чтобы после его
+    пересоздания версии не совпали со старыми ключами кэша.
+    """
+
+    def __init__(self, path, models):
+        self.path = path
+        self.slots = {model._meta.db_table: index
+                      for index, model in enumerate(models)}
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        size = len(self.slots) * VERSION.size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+                start = time.time_ns()
+                for slot in range(len(self.slots)):
+                    os.pwrite(fd, VERSION.pack(start), slot * VERSION.size)
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._map = mmap.mmap(fd, size)
+        self._pid = os.getpid()
+
+    def _ensure_open(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._open()
+
+    def get(self, tables):
+        self._ensure_open()
+        return [
+            VERSION.unpack_from(
+                self._map, self.slots[table] * VERSION.size)[0]
+            for table in tables
+        ]
+
+    def bump(self, table):
+        self._ensure_open()
+        offset = self.slots[table] * VERSION.size
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, VERSION.size, offset)
+            try:
+                version = VERSION.unpack_from(self._map, offset)[0]
+                VERSION.pack_into(self._map, offset, version + 1)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, VERSION.size, offset)
+
+
+table_versions = TableVersions(
+    settings.TABLE_VERSIONS_PATH, VERSIONED_MODELS)
+
+
+def bump_version(model):
+    """Меняет версию таблицы model после коммита текущей транзакции."""
+    transaction.on_commit(
+        partial(table_versions.bump, model._meta.db_table))
+
+
+def cached_count(queryset, estimate=False):
+    """
+    Число строк queryset из кэша. Ключ - SQL с параметрами (одинаковые
+    фильтры дают одинаковый запрос) и версии таблиц, упомянутых в нём,
+    в том числе в подзапросах. При промахе считается точный COUNT(*),
+    а с estimate - estimated_count: точно для небольших выборок, по
+    плану запроса - для больших. Считается в основной базе: версии
+    таблиц меняются после коммита, и число с отстающей реплики
+    осталось бы в кэше под новой версией. Кэш - CACHES['default']: без
+    общего бэкенда у каждого воркера свой LocMemCache и свои промахи.
+    """
+    sql, params = queryset.query.sql_with_params()
+    quote = connections[queryset.db].ops.quote_name
+    tables = [table for table in table_versions.slots if quote(table) in sql]
+    signature = repr((sql, params, table_versions.get(tables)))
+    prefix = 'estimate:' if estimate else 'count:'
+    key = prefix + hashlib.blake2b(
+        signature.encode(), digest_size=16).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        queryset = queryset.using(DEFAULT_DB_ALIAS)
+        count = estimated_count(queryset) if estimate else queryset.count()
+        cache.set(key, count, settings.COUNT_CACHE_TIMEOUT)
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Точное число из кэша: по нему Paginator проверяет номер страницы и
+    решает, есть ли следующая, так что оценка давала бы лишние 404 и
+    неверную ссылку next.
+    """
+
+    @cached_property
+    def count(self):
+        return cached_count(self.object_list)
+
+
+def connect_signals():
+    for model in VERSIONED_MODELS:
+        receiver = partial(lambda model, **kwargs: bump_version(model), model)
+        post_save.connect(receiver, sender=model, weak=False,
+                          dispatch_uid=f'count_save_{model.__name__}')
+        post_delete.connect(receiver, sender=model, weak=False,
+                            dispatch_uid=f'count_delete_{model.__name__}')
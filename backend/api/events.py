@@ -0,0 +1,223 @@
+import asyncio
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db import connections, transaction
+from django.db.models.signals import post_save
+
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'foodgram_events'
+RECIPE_EVENT = 'recipe'
+SUBSCRIPTION_EVENT = 'subscription'
+# Через столько миллисекунд EventSource переподключается после обрыва.
+RETRY_MILLISECONDS = 5000
+TICKET_SALT = 'api.events.ticket'
+
+
+class TicketExpired(Exception):
+    pass
+
+
+def token_digest(key):
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+
+def issue_ticket(token):
+    """
+    Билет для ?ticket= потока событий: EventSource не умеет слать
+    заголовки, а токен в адресе остался бы в журналах прокси. Билет
+    подписан SECRET_KEY, даёт доступ только к потоку и действует
+    EVENTS_TICKET_SECONDS (сутки) - переподключения EventSource после
+    обрывов идут с тем же адресом. Билет привязан к токену и перестаёт
+    действовать при выходе (токен удаляется).
+    """
+    return signing.dumps([token.user_id, token_digest(token.key)],
+                         salt=TICKET_SALT)
+
+
+def read_ticket(ticket):
+    """
+    (id пользователя, отпечаток токена) из билета или None, если
+    подпись неверна. Просроченный билет - TicketExpired.
+    """
+    try:
+        user_id, digest = signing.loads(
+            ticket, salt=TICKET_SALT, max_age=settings.EVENTS_TICKET_SECONDS)
+    except signing.SignatureExpired:
+        raise TicketExpired
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    return user_id, digest
+
+
+def publish(event):
+    """
+    Отправляет событие всем воркерам после коммита текущей транзакции:
+    подписчики не должны узнать о рецепте раньше, чем его теги и
+    ингредиенты станут видны, и о рецепте, который откатился. В
+    PostgreSQL - через NOTIFY, в остальных базах событие рассылается
+    только в этом процессе.
+    """
+    payload = json.dumps(event, separators=(',', ':'))
+    transaction.on_commit(partial(send_event, payload))
+
+
+def send_event(payload):
+    connection = connections['default']
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, payload])
+    else:
+        broker.dispatch_threadsafe(payload)
+
+
+def publish_recipe(recipe):
+    publish({
+        'type': RECIPE_EVENT,
+        'id': recipe.id,
+        'author': recipe.author_id,
+        'name': recipe.name,
+    })
+
+
+def publish_subscription(user_id, author_id, active):
+    publish({
+        'type': SUBSCRIPTION_EVENT,
+        'user': user_id,
+        'author': author_id,
+        'active': active,
+    })
+
+
+def recipe_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        publish_recipe(instance)
+
+
+def connect_signals():
+    post_save.connect(recipe_created, sender=Recipe,
+                      dispatch_uid='events_recipe_created')
+
+
+def format_event(event):
+    data = json.dumps(
+        {key: event[key] for key in ('id', 'author', 'name')},
+        ensure_ascii=False, separators=(',', ':'))
+    return f'id: {event["id"]}\nevent: {event["type"]}\ndata: {data}\n\n'
+
+
+class Client:
+    """Открытый поток событий одного пользователя."""
+
+    def __init__(self, user_id, authors):
+        self.user_id = user_id
+        self.authors = set(authors)
+        self.queue = asyncio.Queue(settings.EVENTS_QUEUE_SIZE)
+        self.overflow = False
+
+    def push(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Клиент не успевает читать: поток закрывается, после
+            # переподключения пропущенное досылается по Last-Event-ID.
+            self.overflow = True
+
+
+class Broker:
+    """
+    Рассылка событий подключённым клиентам воркера. Одно соединение
+    с базой на процесс слушает канал (LISTEN) и раскладывает события
+    по индексу автор -> подписчики, поэтому число открытых потоков
+    не влияет на нагрузку на базу.
+    """
+
+    def __init__(self):
+        self.followers = defaultdict(set)
+        self.clients = defaultdict(set)
+        self._loop = None
+        self._listener = None
+
+    def add(self, client):
+        self._start()
+        self.clients[client.user_id].add(client)
+        for author in client.authors:
+            self.followers[author].add(client)
+
+    def remove(self, client):
+        self._discard(self.clients, client.user_id, client)
+        for author in client.authors:
+            self._discard(self.followers, author, client)
+
+    @staticmethod
+    def _discard(index, key, client):
+        clients = index.get(key)
+        if clients is not None:
+            clients.discard(client)
+            if not clients:
+                del index[key]
+
+    def dispatch(self, payload):
+        event = json.loads(payload)
+        if event['type'] == RECIPE_EVENT:
+            for client in self.followers.get(event['author'], ()):
+                client.push(event)
+        elif event['type'] == SUBSCRIPTION_EVENT:
+            for client in self.clients.get(event['user'], ()):
+                if event['active']:
+                    client.authors.add(event['author'])
+                    self.followers[event['author']].add(client)
+                else:
+                    client.authors.discard(event['author'])
+                    self._discard(self.followers, event['author'], client)
+
+    def dispatch_threadsafe(self, payload):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self.dispatch, payload)
+
+    def _start(self):
+        self._loop = asyncio.get_running_loop()
+        if self._listener is None or self._listener.done():
+            if connections['default'].vendor == 'postgresql':
+                self._listener = self._loop.create_task(self._listen())
+
+    async def _listen(self):
+        while True:
+            try:
+                await self._listen_once()
+            except Exception:
+                logger.warning('Соединение LISTEN потеряно', exc_info=True)
+            await asyncio.sleep(RETRY_MILLISECONDS / 1000)
+
+    async def _listen_once(self):
+        database = connections['default']
+        params = database.get_connection_params()
+        connection = await sync_to_async(
+            database.get_new_connection, thread_sensitive=False)(params)
+        connection.autocommit = True
+        readable = asyncio.Event()
+        self._loop.add_reader(connection.fileno(), readable.set)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+            while True:
+                await readable.wait()
+                readable.clear()
+                connection.poll()
+                while connection.notifies:
+                    self.dispatch(connection.notifies.pop(0).payload)
+        finally:
+            self._loop.remove_reader(connection.fileno())
+            connection.close()
+
+
+broker = Broker()
@@ -0,0 +1,128 @@
+from django.db.models import Prefetch
+
+from api.viewer import FAVORITES, SHOPPING_CART, SUBSCRIPTIONS
+from recipes.models import Ingredient, IngredientRecipe
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+EXPAND_PARAM = 'expand'
+
+
+def parse_paths(value):
+    """'id,author.username' -> {'id': {}, 'author': {'username': {}}}."""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in filter(None, path.strip().split('.')):
+            node = node.setdefault(name, {})
+    return tree
+
+
+class FieldSelection:
+    """
+    Поля ответа по ?fields=, ?omit= и ?expand=. Пустое поддерево в
+    fields означает поле целиком. Если expand задан, вложенные объекты,
+    не перечисленные в нём, отдаются только id.
+    """
+
+    def __init__(self, fields=None, omit=None, expand=None):
+        self.fields = fields
+        self.omit = omit or {}
+        self.expand = expand
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params
+        if not any(name in params
+                   for name in (FIELDS_PARAM, OMIT_PARAM, EXPAND_PARAM)):
+            return None
+        return cls(
+            fields=(parse_paths(params[FIELDS_PARAM])
+                    if FIELDS_PARAM in params else None),
+            omit=parse_paths(params.get(OMIT_PARAM, '')),
+            expand=(set(parse_paths(params[EXPAND_PARAM]))
+                    if EXPAND_PARAM in params else None),
+        )
+
+    def includes(self, name):
+        if name in self.omit and not self.omit[name]:
+            return False
+        return self.fields is None or name in self.fields
+
+    def expanded(self, name):
+        return self.includes(name) and (
+            self.expand is None or name in self.expand)
+
+    def child(self, name):
+        fields = self.fields.get(name) if self.fields is not None else None
+        return FieldSelection(
+            fields=fields or None, omit=self.omit.get(name))
+
+
+class SparseFieldsMixin:
+    """
+    Убирает из сериализатора поля, не выбранные в FieldSelection, до
+    сериализации. Выбор корня берётся из context['field_selection'],
+    вложенные сериализаторы получают свою часть от родителя.
+    """
+    # Поля-связи, которые без ?expand= отдаются как id: имя -> фабрика
+    # заменяющего поля.
+    collapsed_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = getattr(self, 'field_selection', None)
+        if selection is None and self.root in (self, self.parent):
+            selection = self.context.get('field_selection')
+        if selection is None:
+            return fields
+        for name in list(fields):
+            if not selection.includes(name):
+                del fields[name]
+            elif name in self.collapsed_fields and not selection.expanded(
+                    name):
+                fields[name] = self.collapsed_fields[name]()
+            else:
+                nested = getattr(fields[name], 'child', fields[name])
+                if isinstance(nested, SparseFieldsMixin):
+                    nested.field_selection = selection.child(name)
+        return fields
+
+
+def rendered_viewer_flags(selection):
+    """Флаги пользователя, которые попадут в ответ с рецептами."""
+    if selection is None:
+        return {FAVORITES, SHOPPING_CART, SUBSCRIPTIONS}
+    kinds = set()
+    if selection.includes('is_favorited'):
+        kinds.add(FAVORITES)
+    if selection.includes('is_in_shopping_cart'):
+        kinds.add(SHOPPING_CART)
+    if selection.expanded('author') and selection.child('author').includes(
+            'is_subscribed'):
+        kinds.add(SUBSCRIPTIONS)
+    return kinds
+
+
+def optimize_recipe_queryset(queryset, selection):
+    """
+    Соединения и prefetch только для выбранных полей; text, если его
+    не просят, не читается из базы.
+    """
+    if selection is None:
+        return queryset.select_related('author').prefetch_related(
+            'tags', 'ingredientrecipe_set__ingredient')
+    if selection.expanded('author'):
+        queryset = queryset.select_related('author')
+    if selection.includes('tags'):
+        queryset = queryset.prefetch_related('tags')
+    if selection.expanded('ingredients'):
+        queryset = queryset.prefetch_related(Prefetch(
+            'ingredientrecipe_set',
+            queryset=IngredientRecipe.objects.select_related('ingredient')))
+    elif selection.includes('ingredients'):
+        queryset = queryset.prefetch_related(Prefetch(
+            'ingredients', queryset=Ingredient.objects.only('id')))
+    if not selection.includes('text'):
+        queryset = queryset.defer('text')
+    return queryset
@@ -1,10 +1,17 @@
 from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
 
 from recipes.models import Ingredient, Recipe, Tag
 
 User = get_user_model()
 
+RECIPE_ORDERINGS = {
+    'popular': ('-popular_score', '-id'),
+    'trending': ('-trending_score', '-id'),
+}
+DEFAULT_RECIPE_ORDERING = ('-id',)
+
 
 class IngredientFilter(FilterSet):
     name = filters.CharFilter(lookup_expr='startswith')
@@ -42,3 +49,33 @@ class RecipeFilter(FilterSet):
         if value and not user.is_anonymous:
             return queryset.filter(shopping_cart__user=user)
         return queryset
+
+
+def filter_recipe_queryset(queryset, params, user):
+    is_favorited = params.get('is_favorited')
+    is_in_shopping_cart = params.get('is_in_shopping_cart')
+    author = params.get('author')
+    tags = sorted(set(params.getlist('tags')))
+
+    if user.is_authenticated:
+        if is_favorited == '1':
+            queryset = queryset.filter(favorited_by__user=user)
+        elif is_favorited == '0':
+            queryset = queryset.exclude(favorited_by__user=user)
+        if is_in_shopping_cart == '1':
+            queryset = queryset.filter(in_shopping_cart__user=user)
+        elif is_in_shopping_cart == '0':
+            queryset = queryset.exclude(in_shopping_cart__user=user)
+
+    if author:
+        queryset = queryset.filter(author__id=author)
+    if tags:
+        queryset = queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'), tag__slug__in=tags)))
+
+    return queryset
+
+
+def order_recipe_queryset(queryset, params):
+    return queryset.order_by(*RECIPE_ORDERINGS.get(
+        params.get('ordering'), DEFAULT_RECIPE_ORDERING))
@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный замер эндпоинта: запросов в секунду и '
+            'перцентили задержки при заданной конкурентности')
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', type=str)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--method', type=str, default='GET')
+        parser.add_argument('--token', type=str, default=None)
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('Число запросов и потоков должно быть > 0')
+
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        sessions = threading.local()
+
+        def call(_):
+            if not hasattr(sessions, 'session'):
+                sessions.session = requests.Session()
+            started = time.perf_counter()
+            try:
+                response = sessions.session.request(
+                    options['method'], options['url'], headers=headers,
+                    timeout=options['timeout'])
+                code = response.status_code
+            except requests.RequestException as error:
+                code = type(error).__name__
+            return code, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            results = list(executor.map(call, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency * 1000 for _, latency in results)
+
+        def percentile(value):
+            return latencies[min(len(latencies) - 1,
+                                 int(len(latencies) * value / 100))]
+
+        self.stdout.write(
+            f'{len(results)} запросов за {elapsed:.2f} с, '
+            f'{len(results) / elapsed:.1f} запр/с, '
+            f'конкурентность {options["concurrency"]}')
+        self.stdout.write(
+            f'задержка, мс: p50={percentile(50):.1f} '
+            f'p95={percentile(95):.1f} p99={percentile(99):.1f} '
+            f'max={latencies[-1]:.1f}')
+        for code, count in sorted(Counter(
+                str(code) for code, _ in results).items()):
+            self.stdout.write(f'  {code}: {count}')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.catalog import build_catalog, get_catalog
+
+
+class Command(BaseCommand):
+    help = 'Сборка сегмента каталога ингредиентов и тегов в общей памяти'
+
+    def handle(self, *args, **options):
+        build_catalog()
+        catalog = get_catalog()
+        self.stdout.write(
+            f'Версия {catalog.version}: ингредиентов '
+            f'{catalog.ingredients.count}, тегов {catalog.tags.count}')
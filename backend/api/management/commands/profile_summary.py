@@ -0,0 +1,73 @@
+import re
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from foodgram_backend.profiling import load_profiles
+
+PLACEHOLDERS = re.compile(r'%s(?:, %s)+')
+
+
+def percentile(values, value):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * value / 100))]
+
+
+class Command(BaseCommand):
+    help = ('Сводка профилей SamplingProfilerMiddleware по эндпоинтам: '
+            'длительность, горячие функции (собственное и полное время) '
+            'и самые долгие SQL-запросы')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', type=str, default=settings.PROFILER_DIR)
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument('--endpoint', type=str, default=None)
+
+    def handle(self, *args, **options):
+        endpoints = defaultdict(lambda: {
+            'durations': [], 'slow': 0, 'own': Counter(),
+            'total': Counter(), 'samples': 0, 'sql': Counter(),
+            'sql_count': Counter(),
+        })
+        for profile in load_profiles(options['dir']):
+            if options['endpoint'] and (
+                    options['endpoint'] not in profile['endpoint']):
+                continue
+            stats = endpoints[profile['endpoint']]
+            stats['durations'].append(profile['duration'])
+            stats['slow'] += profile['reason'] == 'slow'
+            for count, stack in profile['samples']:
+                stats['samples'] += count
+                if stack:
+                    stats['own'][stack[0]] += count
+                for frame in set(stack):
+                    stats['total'][frame] += count
+            for query in profile['queries']:
+                sql = PLACEHOLDERS.sub('%s, ...', query['sql'])
+                stats['sql'][sql] += query['time']
+                stats['sql_count'][sql] += 1
+
+        top = options['top']
+        for endpoint, stats in sorted(
+                endpoints.items(),
+                key=lambda item: -sum(item[1]['durations'])):
+            durations = [value * 1000 for value in stats['durations']]
+            self.stdout.write(self.style.MIGRATE_HEADING(endpoint))
+            self.stdout.write(
+                f'  профилей {len(durations)} (медленных {stats["slow"]}), '
+                f'мс: p50={percentile(durations, 50):.1f} '
+                f'p95={percentile(durations, 95):.1f} '
+                f'max={max(durations):.1f}')
+            samples = stats['samples'] or 1
+            for title, counter in (('собственное время', stats['own']),
+                                   ('полное время', stats['total'])):
+                self.stdout.write(f'  {title}:')
+                for frame, count in counter.most_common(top):
+                    self.stdout.write(
+                        f'    {count / samples:6.1%}  {frame}')
+            self.stdout.write('  SQL по суммарному времени:')
+            for sql, seconds in stats['sql'].most_common(top):
+                self.stdout.write(
+                    f'    {seconds * 1000:8.1f} мс  '
+                    f'x{stats["sql_count"][sql]}  {sql[:200]}')
@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+
+from api.snapshots import render_snapshots
+
+
+class Command(BaseCommand):
+    help = ('Снимки JSON анонимных страниц (теги, первые страницы '
+            'рецептов, популярные рецепты) для отдачи из nginx; '
+            'с --interval - перерисовка по расписанию')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--root', default=settings.SNAPSHOT_ROOT)
+        parser.add_argument('--pages', type=int,
+                            default=settings.SNAPSHOT_PAGES)
+        parser.add_argument('--recipes', type=int,
+                            default=settings.SNAPSHOT_RECIPES)
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Секунды между перерисовками')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            try:
+                pages, recipes = render_snapshots(
+                    options['root'], options['pages'], options['recipes'])
+            except DatabaseError as error:
+                # По расписанию недоступная база - не повод завершаться.
+                if not options['interval']:
+                    raise
+                self.stderr.write(f'Снимки не обновлены: {error}')
+            else:
+                self.stdout.write(
+                    f'Страниц: {pages}, рецептов: {recipes} '
+                    f'за {time.monotonic() - started:.2f} с')
+            if not options['interval']:
+                return
+            connections.close_all()
+            time.sleep(options['interval'])
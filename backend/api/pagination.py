@@ -1,7 +1,49 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from api.counts import CachedCountPaginator
 
 
 class CustomPagination(PageNumberPagination):
+    django_paginator_class = CachedCountPaginator
     page_size = 10
     page_size_query_param = 'limit'
     max_page_size = 100
+
+
+class FeedPagination(BasePagination):
+    """
+    Пагинация по ключу: ?cursor=<id последнего рецепта>&limit=.
+    Глубокие страницы стоят столько же, сколько первая.
+    """
+    cursor_query_param = 'cursor'
+    page_size = CustomPagination.page_size
+    page_size_query_param = CustomPagination.page_size_query_param
+    max_page_size = CustomPagination.max_page_size
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor is None:
+            return None
+        try:
+            return int(cursor)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_paginated_response(self, request, data, next_cursor):
+        next_link = None
+        if next_cursor is not None:
+            next_link = replace_query_param(
+                request.build_absolute_uri(),
+                self.cursor_query_param, next_cursor)
+        return Response({'next': next_link, 'results': data})
@@ -0,0 +1,57 @@
+from django.db import connection
+from django.utils import timezone
+
+from api.counts import bump_version
+
+# Проверка объекта, вставка и ответ - один запрос: при повторной или
+# параллельной вставке ON CONFLICT DO NOTHING вместо IntegrityError,
+# а вставлена ли строка, видно по RETURNING.
+ADD_SQL = '''
+WITH target AS (
+    SELECT {columns} FROM {target} WHERE {target_pk} = %(pk)s
+), inserted AS (
+    INSERT INTO {table} ({insert_columns})
+    SELECT {insert_values} FROM target
+    ON CONFLICT DO NOTHING
+    RETURNING 1
+)
+SELECT target.*, EXISTS(SELECT 1 FROM inserted) FROM target
+'''
+
+
+def add_relation(model, user, target_field, pk, fields):
+    """
+    Создаёт связь model (Favorite, ShoppingCart, Subscription) между
+    user и объектом pk. Возвращает объект с полями fields или None,
+    если его нет, и признак того, что связь создана этим запросом.
+    """
+    quote = connection.ops.quote_name
+    relation = model._meta.get_field(target_field)
+    target = relation.related_model
+    target_fields = [target._meta.get_field(name) for name in fields]
+    values = {
+        model._meta.get_field('user').column: '%(user)s',
+        relation.column: quote(target._meta.pk.column),
+    }
+    if any(field.name == 'created_at' for field in model._meta.fields):
+        values[model._meta.get_field('created_at').column] = '%(now)s'
+    sql = ADD_SQL.format(
+        columns=', '.join(quote(field.column) for field in target_fields),
+        target=quote(target._meta.db_table),
+        target_pk=quote(target._meta.pk.column),
+        table=quote(model._meta.db_table),
+        insert_columns=', '.join(quote(column) for column in values),
+        insert_values=', '.join(values.values()),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'pk': pk, 'user': user.pk, 'now': timezone.now()})
+        row = cursor.fetchone()
+    if row is None:
+        return None, False
+    *values, created = row
+    if created:
+        # Сырой INSERT не вызывает post_save.
+        bump_version(model)
+    return target(**{
+        field.attname: value for field, value in zip(target_fields, values)
+    }), created
@@ -0,0 +1,122 @@
+import heapq
+import re
+import threading
+from array import array
+from collections import Counter
+from functools import lru_cache
+
+from django.db import connection
+
+from api.constants import FUZZY_SEARCH_LIMIT, TRIGRAM_SIMILARITY_THRESHOLD
+from recipes.models import Ingredient
+
+WORD = re.compile(r'\w+')
+
+# Оператор % использует порог pg_trgm.similarity_threshold, по
+# умолчанию 0.3 - тот же, что TRIGRAM_SIMILARITY_THRESHOLD.
+SIMILAR_SQL = '''
+SELECT id FROM {table}
+WHERE lower(name) %% %(query)s
+ORDER BY similarity(lower(name), %(query)s) DESC, lower(name), id
+LIMIT %(limit)s
+'''
+
+
+def trigrams(text):
+    """Триграммы как в pg_trgm: по словам, с пробелами по краям."""
+    result = set()
+    for word in WORD.findall(text.lower()):
+        padded = f'  {word} '
+        result.update(
+            padded[index:index + 3] for index in range(len(padded) - 2))
+    return result
+
+
+@lru_cache(maxsize=None)
+def database_has_trigrams():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS(SELECT 1 FROM pg_extension WHERE extname = "
+            "'pg_trgm')"
+        )
+        return cursor.fetchone()[0]
+
+
+class TrigramIndex:
+    """Инвертированный индекс триграмм по именам секции каталога."""
+
+    def __init__(self, section):
+        self.ids = array('q', section.ids())
+        self.sizes = array('I')
+        postings = {}
+        for position, name in enumerate(section.names()):
+            grams = trigrams(name)
+            self.sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, array('I')).append(position)
+        self.postings = postings
+
+    def search(self, query, limit, threshold=TRIGRAM_SIMILARITY_THRESHOLD):
+        grams = trigrams(query)
+        if not grams:
+            return []
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        scored = []
+        for position, common in shared.items():
+            score = common / (len(grams) + self.sizes[position] - common)
+            if score >= threshold:
+                scored.append((-score, position))
+        return [self.ids[position]
+                for _, position in heapq.nsmallest(limit, scored)]
+
+
+_lock = threading.Lock()
+_indexes = {}
+
+
+def local_index(catalog):
+    """Индекс для текущей версии каталога, строится один раз."""
+    index = _indexes.get(catalog.version)
+    if index is None:
+        with _lock:
+            index = _indexes.get(catalog.version)
+            if index is None:
+                index = TrigramIndex(catalog.ingredients)
+                _indexes.clear()
+                _indexes[catalog.version] = index
+    return index
+
+
+def similar_ingredient_ids(catalog, query, limit):
+    if database_has_trigrams():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                SIMILAR_SQL.format(table=connection.ops.quote_name(
+                    Ingredient._meta.db_table)),
+                {'query': query.lower(), 'limit': limit}
+            )
+            return [row[0] for row in cursor.fetchall()]
+    return local_index(catalog).search(query, limit)
+
+
+def fuzzy_ingredients(catalog, query, limit=FUZZY_SEARCH_LIMIT):
+    """
+    JSON-массив ингредиентов: сначала все совпадения по началу имени,
+    затем до limit похожих по триграммам.
+    """
+    section = catalog.ingredients
+    first, last = section.prefix_range(query)
+    found = set(section.ids(first, last))
+    similar = []
+    for pk in similar_ingredient_ids(catalog, query, limit + len(found)):
+        data = section.get(pk)
+        if pk not in found and data is not None:
+            similar.append(bytes(data))
+            if len(similar) == limit:
+                break
+    prefix = [bytes(section.span(first, last))] if first != last else []
+    return b'[' + b','.join(prefix + similar) + b']'
@@ -1,15 +1,24 @@
 import base64
 import logging
+import math
+from functools import partial
+from urllib.parse import parse_qs, urlsplit
 
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
+from django.db import transaction
 from rest_framework import serializers
 
-from .constants import (EMAIL_MAX_LENGTH, FIRST_NAME_MAX_LENGTH,
-                        LAST_NAME_MAX_LENGTH, MAX_AMOUNT, MIN_AMOUNT,
-                        USERNAME_MAX_LENGTH)
+from .catalog import get_catalog
+from .constants import (BATCH_MAX_COST, BATCH_MAX_REQUESTS,
+                        BATCH_URL_MAX_LENGTH, EMAIL_MAX_LENGTH,
+                        FIRST_NAME_MAX_LENGTH, LAST_NAME_MAX_LENGTH,
+                        MAX_AMOUNT, MIN_AMOUNT, USERNAME_MAX_LENGTH)
+from .fields import SparseFieldsMixin
+from .pagination import CustomPagination
+from .viewer import FAVORITES, SHOPPING_CART, SUBSCRIPTIONS, get_viewer
 from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
 from users.models import Subscription, User, validate_username
 
@@ -95,7 +104,7 @@ class UserAvatarSerializer(serializers.ModelSerializer):
         fields = ['avatar']
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     avatar = Base64ImageField(required=False)
     is_subscribed = serializers.SerializerMethodField()
 
@@ -107,9 +116,9 @@ class UserSerializer(serializers.ModelSerializer):
 
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.subscribers.filter(user=request.user).exists()
-        return False
+        if request is None:
+            return False
+        return get_viewer(request).has(SUBSCRIPTIONS, obj.id)
 
 
 class PasswordChangeSerializer(serializers.Serializer):
@@ -138,7 +147,7 @@ class RecipeMinifiedSerializer(serializers.ModelSerializer):
         return representation
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ('id', 'name', 'slug')
@@ -150,7 +159,8 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
-class IngredientInRecipeSerializer(serializers.ModelSerializer):
+class IngredientInRecipeSerializer(SparseFieldsMixin,
+                                   serializers.ModelSerializer):
     name = serializers.CharField(source='ingredient.name', read_only=True)
     measurement_unit = serializers.CharField(
         source='ingredient.measurement_unit',
@@ -164,8 +174,32 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
+class CatalogRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Проверяет id по сегменту каталога без запроса к базе и возвращает
+    сам id. В базу обращается только при промахе: сегмент мог ещё не
+    пересобраться после добавления объекта.
+    """
+
+    def __init__(self, section, **kwargs):
+        self.section = section
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if (pk not in getattr(get_catalog(), self.section)
+                and not self.get_queryset().filter(pk=pk).exists()):
+            self.fail('does_not_exist', pk_value=data)
+        return pk
+
+
 class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = CatalogRelatedField('ingredients', queryset=Ingredient.objects.all())
     amount = serializers.IntegerField(min_value=MIN_AMOUNT,
                                       max_value=MAX_AMOUNT)
 
@@ -176,7 +210,8 @@ class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
 
 class RecipeInputSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = CatalogRelatedField(
+        'tags',
         queryset=Tag.objects.all(),
         many=True,
         required=True
@@ -210,12 +245,13 @@ class RecipeInputSerializer(serializers.ModelSerializer):
     def create_ingredients(self, recipe, ingredients_data):
         ingredients = [
             IngredientRecipe(
-                recipe=recipe, ingredient=item['id'],
+                recipe=recipe, ingredient_id=item['id'],
                 amount=item['amount'])
             for item in ingredients_data
         ]
         IngredientRecipe.objects.bulk_create(ingredients)
 
+    @transaction.atomic
     def create(self, validated_data):
         tags_data = validated_data.pop('tags')
         ingredients_data = validated_data.pop('ingredients')
@@ -224,6 +260,7 @@ class RecipeInputSerializer(serializers.ModelSerializer):
         self.create_ingredients(recipe, ingredients_data)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags_data = validated_data.pop('tags', None)
         ingredients_data = validated_data.pop('ingredients', None)
@@ -242,7 +279,7 @@ class RecipeInputSerializer(serializers.ModelSerializer):
         return instance
 
 
-class RecipeOutputSerializer(serializers.ModelSerializer):
+class RecipeOutputSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     ingredients = IngredientInRecipeSerializer(
@@ -252,6 +289,15 @@ class RecipeOutputSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
+    collapsed_fields = {
+        'author': partial(
+            serializers.PrimaryKeyRelatedField, read_only=True),
+        'tags': partial(
+            serializers.PrimaryKeyRelatedField, many=True, read_only=True),
+        'ingredients': partial(
+            serializers.PrimaryKeyRelatedField, many=True, read_only=True),
+    }
+
     class Meta:
         model = Recipe
         fields = (
@@ -262,16 +308,11 @@ class RecipeOutputSerializer(serializers.ModelSerializer):
         )
 
     def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return obj.favorited_by.filter(user=user).exists()
+        return get_viewer(self.context['request']).has(FAVORITES, obj.id)
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return obj.in_shopping_cart.filter(user=user).exists()
+        return get_viewer(self.context['request']).has(
+            SHOPPING_CART, obj.id)
 
 
 class SubscriptionSerializer(serializers.ModelSerializer):
@@ -299,8 +340,8 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        return user.subscribed_users.filter(author=obj.author).exists()
+        return get_viewer(self.context['request']).has(
+            SUBSCRIPTIONS, obj.author_id)
 
     def get_recipes(self, obj):
         recipes_limit = self.context['request'].query_params.get(
@@ -314,3 +355,39 @@ class SubscriptionSerializer(serializers.ModelSerializer):
 
     def get_recipes_count(self, obj):
         return obj.author.recipes.count()
+
+
+def request_cost(url):
+    """Стоимость подзапроса в страницах стандартного размера."""
+    query = parse_qs(urlsplit(url).query)
+    try:
+        limit = int(query.get('limit', ['0'])[0])
+    except ValueError:
+        limit = 0
+    limit = min(limit, CustomPagination.max_page_size)
+    return max(1, math.ceil(limit / CustomPagination.page_size))
+
+
+class BatchItemSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=['GET'], default='GET')
+    url = serializers.CharField(max_length=BATCH_URL_MAX_LENGTH)
+
+    def validate_url(self, value):
+        path = urlsplit(value).path
+        if not path.startswith('/api/') or path.startswith('/api/batch/'):
+            raise serializers.ValidationError(
+                'Допустимы только адреса API, кроме /api/batch/.')
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, value):
+        if len(value) > BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                f'Не более {BATCH_MAX_REQUESTS} запросов в пакете.')
+        if sum(request_cost(item['url']) for item in value) > BATCH_MAX_COST:
+            raise serializers.ValidationError(
+                f'Суммарная стоимость запросов больше {BATCH_MAX_COST}.')
+        return value
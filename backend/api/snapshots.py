@@ -0,0 +1,258 @@
+import gzip
+import io
+import json
+import os
+import re
+import threading
+from urllib.parse import urlencode, urlsplit
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.async_views import recipe_list, recipe_queryset, tag_list
+from api.serializers import RecipeOutputSerializer
+from foodgram_backend.db_routers import read_from
+from foodgram_backend.profiling import ProfiledViewMixin
+from recipes.counters import recipe_views
+from recipes.models import Recipe, Tag
+from users.models import User
+
+# Раскладка каталога снимков, её же знает nginx (map $api_snapshot):
+#   tags.json              GET /api/tags/
+#   recipes/page-N.json    GET /api/recipes/?page=N&limit=6
+#   recipes/<id>.json      GET /api/recipes/<id>/
+# Снимки отдаются только запросам без заголовка Authorization. Рядом
+# с каждым лежит .gz для gzip_static.
+TAGS_SNAPSHOT = 'tags.json'
+RECIPES_DIR = 'recipes'
+PAGE_PREFIX = 'page-'
+SNAPSHOT_SUFFIX = '.json'
+GZIP_SUFFIX = '.gz'
+# Размер страницы, с которым список рецептов запрашивает SPA.
+SNAPSHOT_PAGE_SIZE = 6
+RECIPE_PATH = re.compile(r'/api/recipes/(\d+)/')
+# Поля пользователя, которые видны в рецептах (автор). Сохранение
+# других полей, например last_login при входе, снимки не сбрасывает.
+AUTHOR_FIELDS = {'username', 'first_name', 'last_name', 'email', 'avatar'}
+
+
+def base_url():
+    if not settings.SNAPSHOT_BASE_URL:
+        raise ImproperlyConfigured(
+            'Для снимков нужен SNAPSHOT_BASE_URL - публичный адрес сайта')
+    return settings.SNAPSHOT_BASE_URL
+
+
+def anonymous_request(path, query=None):
+    """Запрос анонимного пользователя к SNAPSHOT_BASE_URL + path."""
+    base = urlsplit(base_url())
+    default_port = '443' if base.scheme == 'https' else '80'
+    request = WSGIRequest({
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': urlencode(query or {}),
+        'HTTP_HOST': base.netloc,
+        'SERVER_NAME': base.hostname,
+        'SERVER_PORT': str(base.port or default_port),
+        'wsgi.url_scheme': base.scheme,
+        'wsgi.input': io.BytesIO(),
+    })
+    return Request(request, authenticators=())
+
+
+def write_snapshot(path, content):
+    """
+    Пишет снимок и его .gz во временные файлы и подменяет старые
+    os.replace: nginx видит либо старую, либо новую версию целиком.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    for target, data in (
+        (path + GZIP_SUFFIX, gzip.compress(content, mtime=0)),
+        (path, content),
+    ):
+        temp_path = f'{target}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, target)
+
+
+def remove_snapshot(path):
+    for target in (path, path + GZIP_SUFFIX):
+        try:
+            os.unlink(target)
+        except FileNotFoundError:
+            pass
+
+
+def snapshot_names(directory, prefix=''):
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return set()
+    with entries:
+        return {entry.name for entry in entries
+                if entry.name.startswith(prefix)
+                and entry.name.endswith(SNAPSHOT_SUFFIX)}
+
+
+def render_tags(root):
+    response = async_to_sync(tag_list)(anonymous_request('/api/tags/'))
+    write_snapshot(os.path.join(root, TAGS_SNAPSHOT), response.content)
+
+
+def render_pages(root, pages):
+    """Первые pages страниц списка; возвращает число записанных."""
+    directory = os.path.join(root, RECIPES_DIR)
+    written = set()
+    for page in range(1, pages + 1):
+        response = async_to_sync(recipe_list)(anonymous_request(
+            '/api/recipes/', {'page': page, 'limit': SNAPSHOT_PAGE_SIZE}))
+        if response.status_code != status.HTTP_200_OK:
+            break
+        name = f'{PAGE_PREFIX}{page}{SNAPSHOT_SUFFIX}'
+        write_snapshot(os.path.join(directory, name), response.content)
+        written.add(name)
+        if json.loads(response.content)['next'] is None:
+            break
+    for name in snapshot_names(directory, PAGE_PREFIX) - written:
+        remove_snapshot(os.path.join(directory, name))
+    return len(written)
+
+
+def render_recipes(root, limit):
+    """
+    Самые популярные рецепты. Сериализуются напрямую, а не через
+    recipe_detail, чтобы не засчитывать просмотры.
+    """
+    directory = os.path.join(root, RECIPES_DIR)
+    request = anonymous_request('/api/recipes/')
+    recipes = recipe_queryset().order_by('-popular_score', '-id')[:limit]
+    renderer = JSONRenderer()
+    written = set()
+    for recipe in recipes:
+        name = f'{recipe.id}{SNAPSHOT_SUFFIX}'
+        write_snapshot(os.path.join(directory, name), renderer.render(
+            RecipeOutputSerializer(recipe, context={'request': request}).data))
+        written.add(name)
+    stale = snapshot_names(directory) - written - snapshot_names(
+        directory, PAGE_PREFIX)
+    for name in stale:
+        remove_snapshot(os.path.join(directory, name))
+    return len(written)
+
+
+def render_snapshots(root=None, pages=None, recipes=None):
+    root = root or settings.SNAPSHOT_ROOT
+    render_tags(root)
+    return (
+        render_pages(root, pages or settings.SNAPSHOT_PAGES),
+        render_recipes(root, recipes or settings.SNAPSHOT_RECIPES),
+    )
+
+
+_lock = threading.Lock()
+_state = {'timer': None}
+
+
+def _render():
+    with _lock:
+        _state['timer'] = None
+    try:
+        # Перерисовка идёт сразу после коммита изменения, реплика может
+        # его ещё не получить.
+        with read_from(True):
+            render_snapshots()
+    finally:
+        connections.close_all()
+
+
+def invalidate(recipe_ids=None):
+    """
+    Удаляет снимки, которые изменение сделало устаревшими (до
+    перерисовки запросы уходят в backend), и планирует перерисовку.
+    recipe_ids - изменённые рецепты, None - все снимки. Изменения за
+    SNAPSHOT_RENDER_DELAY собираются в одну.
+    """
+    root = settings.SNAPSHOT_ROOT
+    directory = os.path.join(root, RECIPES_DIR)
+    if recipe_ids is None:
+        remove_snapshot(os.path.join(root, TAGS_SNAPSHOT))
+        names = snapshot_names(directory)
+    else:
+        names = snapshot_names(directory, PAGE_PREFIX)
+        names.update(f'{pk}{SNAPSHOT_SUFFIX}' for pk in recipe_ids)
+    for name in names:
+        remove_snapshot(os.path.join(directory, name))
+    with _lock:
+        if _state['timer'] is not None:
+            return
+        timer = threading.Timer(settings.SNAPSHOT_RENDER_DELAY, _render)
+        timer.daemon = True
+        _state['timer'] = timer
+    timer.start()
+
+
+def recipe_changed(sender, instance, **kwargs):
+    # После удаления pk экземпляра сбрасывается, поэтому он запоминается.
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate([pk]))
+
+
+def tag_changed(**kwargs):
+    transaction.on_commit(invalidate)
+
+
+def author_changed(sender, instance, created, update_fields=None,
+                   raw=False, **kwargs):
+    if created or raw or (
+            update_fields is not None
+            and AUTHOR_FIELDS.isdisjoint(update_fields)):
+        return
+    author_id = instance.pk
+    transaction.on_commit(lambda: invalidate(Recipe.objects.filter(
+        author_id=author_id).values_list('id', flat=True)))
+
+
+def connect_signals():
+    if not settings.SNAPSHOTS_ENABLED:
+        return
+    base_url()
+    post_save.connect(recipe_changed, sender=Recipe,
+                      dispatch_uid='snapshots_recipe_save')
+    post_delete.connect(recipe_changed, sender=Recipe,
+                        dispatch_uid='snapshots_recipe_delete')
+    post_save.connect(tag_changed, sender=Tag,
+                      dispatch_uid='snapshots_tag_save')
+    post_delete.connect(tag_changed, sender=Tag,
+                        dispatch_uid='snapshots_tag_delete')
+    post_save.connect(author_changed, sender=User,
+                      dispatch_uid='snapshots_author_save')
+
+
+class SnapshotHitView(ProfiledViewMixin, View):
+    """
+    Просмотры рецептов, отданных снимком. nginx зеркалирует сюда
+    (mirror) запросы к /api/recipes/<id>/, для которых есть снимок, с
+    исходным адресом в X-Original-URI; остальные засчитал
+    recipe_detail. Условия снимка проверяются и здесь.
+    """
+
+    def get(self, request):
+        uri = urlsplit(request.headers.get('X-Original-URI', ''))
+        match = RECIPE_PATH.fullmatch(uri.path)
+        if (match and not uri.query
+                and 'Authorization' not in request.headers
+                and os.path.exists(os.path.join(
+                    settings.SNAPSHOT_ROOT, RECIPES_DIR,
+                    f'{match[1]}{SNAPSHOT_SUFFIX}'))):
+            recipe_views.add(int(match[1]))
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
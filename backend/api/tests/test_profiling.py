@@ -0,0 +1,50 @@
+import tempfile
+import time
+from unittest import mock
+
+from django.test import AsyncClient, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from api.views import CurrentUserView
+from foodgram_backend.profiling import load_profiles
+from users.models import User
+
+VIEW_SECONDS = 0.05
+
+
+class AsgiProfileTests(TestCase):
+    """
+    Под ASGI синхронное представление выполняется в потоке
+    sync_to_async: его стеки и SQL должны попасть в профиль запроса.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com', username='user',
+            first_name='Имя', last_name='Фамилия', password='password')
+        self.token = Token.objects.create(user=self.user)
+        self.profiles = tempfile.TemporaryDirectory()
+        self.addCleanup(self.profiles.cleanup)
+
+    async def test_sync_view_profile(self):
+        get = CurrentUserView.get
+
+        def slow_get(view, request):
+            time.sleep(VIEW_SECONDS)
+            return get(view, request)
+
+        with override_settings(
+                PROFILER_ENABLED=True, PROFILER_SAMPLE_RATE=1,
+                PROFILER_DIR=self.profiles.name), \
+                mock.patch.object(CurrentUserView, 'get', slow_get):
+            response = await AsyncClient().get(
+                '/api/users/me/',
+                AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 200)
+        [profile] = load_profiles(self.profiles.name)
+        self.assertEqual(profile['endpoint'], 'GET current_user')
+        self.assertTrue(profile['samples'])
+        self.assertTrue(any(
+            'slow_get' in frame
+            for _, stack in profile['samples'] for frame in stack))
+        self.assertTrue(profile['queries'])
@@ -0,0 +1,76 @@
+import threading
+from unittest import mock
+
+from django.db import connections
+from django.test import TransactionTestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.throttling import ScopedBucketThrottle
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+PARALLEL_REQUESTS = 8
+
+
+@mock.patch.object(ScopedBucketThrottle, 'THROTTLE_RATES', {'write': None})
+class ParallelRelationTests(TransactionTestCase):
+    """
+    Одинаковые POST избранного, корзины и подписки, отправленные
+    одновременно: ровно одна связь и один ответ 201, остальные - 400.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com', username='user',
+            first_name='Имя', last_name='Фамилия', password='password')
+        self.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Имя', last_name='Фамилия', password='password')
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/image/recipe.png')
+
+    def post_in_parallel(self, url):
+        barrier = threading.Barrier(PARALLEL_REQUESTS)
+        statuses = []
+
+        def post():
+            client = APIClient(raise_request_exception=False)
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                statuses.append(client.post(url).status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=post)
+                   for _ in range(PARALLEL_REQUESTS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(statuses)
+
+    def assert_created_once(self, url, model, **lookup):
+        self.assertEqual(
+            self.post_in_parallel(url),
+            [status.HTTP_201_CREATED]
+            + [status.HTTP_400_BAD_REQUEST] * (PARALLEL_REQUESTS - 1))
+        self.assertEqual(
+            model.objects.filter(user=self.user, **lookup).count(), 1)
+
+    def test_favorite(self):
+        self.assert_created_once(
+            f'/api/recipes/{self.recipe.id}/favorite/',
+            Favorite, recipe=self.recipe)
+
+    def test_shopping_cart(self):
+        self.assert_created_once(
+            f'/api/recipes/{self.recipe.id}/shopping_cart/',
+            ShoppingCart, recipe=self.recipe)
+
+    def test_subscribe(self):
+        self.assert_created_once(
+            f'/api/users/{self.author.id}/subscribe/',
+            Subscription, author=self.author)
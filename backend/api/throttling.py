@@ -0,0 +1,129 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import SimpleRateThrottle
+
+SLOT = struct.Struct('<Qd')
+SLOTS_PER_BUCKET = 4
+BUCKET_SIZE = SLOT.size * SLOTS_PER_BUCKET
+
+
+class SharedBuckets:
+    """
+    Состояние GCRA (token bucket) в файле, отображённом в память всех
+    воркеров. Ключ хэшируется в корзину из четырёх слотов (ключ,
+    theoretical arrival time); при переполнении корзины вытесняется слот
+    с самым ранним временем. Проверка блокирует только байты своей
+    корзины (fcntl) и в пределах процесса - общий threading.Lock.
+    """
+
+    def __init__(self, path, buckets):
+        self.path = path
+        self.buckets = buckets
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        size = self.buckets * BUCKET_SIZE
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._map = mmap.mmap(fd, size)
+        self._pid = os.getpid()
+
+    def consume(self, key, interval, burst):
+        """
+        Списывает запрос с ключа. interval - период восстановления одного
+        запроса, burst - окно, в которое укладывается весь лимит.
+        Возвращает 0, если запрос разрешён, иначе сколько секунд ждать.
+        """
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        key_hash = int.from_bytes(digest, 'little') | 1
+        offset = (key_hash % self.buckets) * BUCKET_SIZE
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open()
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, BUCKET_SIZE, offset)
+            try:
+                now = time.time()
+                slot, tat = self._find_slot(offset, key_hash)
+                tat = max(tat, now) + interval
+                if tat - now > burst:
+                    return tat - now - burst
+                SLOT.pack_into(self._map, slot, key_hash, tat)
+                return 0
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, BUCKET_SIZE, offset)
+
+    def _find_slot(self, offset, key_hash):
+        oldest, oldest_tat = offset, float('inf')
+        for slot in range(offset, offset + BUCKET_SIZE, SLOT.size):
+            stored_hash, tat = SLOT.unpack_from(self._map, slot)
+            if stored_hash == key_hash:
+                return slot, tat
+            if tat < oldest_tat:
+                oldest, oldest_tat = slot, tat
+        return oldest, 0
+
+
+buckets = SharedBuckets(
+    settings.THROTTLE_STATE_PATH, settings.THROTTLE_BUCKETS)
+
+
+def default_scope(request):
+    return 'read' if request.method in SAFE_METHODS else 'write'
+
+
+class ScopedBucketThrottle(SimpleRateThrottle):
+    """
+    Ограничение частоты по пользователю или IP отдельно для каждой
+    группы эндпоинтов. Группа задаётся throttle_scope представления
+    или throttle_scope_by_action, иначе read/write по методу запроса.
+    """
+
+    def __init__(self):
+        pass
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope_by_action', {}).get(
+            getattr(view, 'action', None))
+        return scope or getattr(view, 'throttle_scope', None) or (
+            default_scope(request))
+
+    def allow_request(self, request, view):
+        return self.check(request, self.get_scope(request, view))
+
+    def check(self, request, scope):
+        self.scope = scope
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self._wait = buckets.consume(
+            self.get_cache_key(request, None),
+            self.duration / self.num_requests,
+            self.duration,
+        )
+        return not self._wait
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return f'{self.scope}:{ident}'
+
+    def wait(self):
+        return self._wait
@@ -1,12 +1,15 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from .async_views import (ingredient_list_view, recipe_detail_view,
+                          recipe_list_view, tag_list_view, user_profile_view)
+from .batch import BatchView
 from .views import (CurrentUserView, CustomTokenObtainView,
-                    DownloadShoppingCartView, FavoriteView, IngredientViewSet,
-                    LogoutView, PasswordChangeView, RecipeShortLinkView,
-                    RecipeViewSet, ShoppingCartView, SubscribeView,
-                    SubscriptionView, TagViewSet, UserAvatarView,
-                    UserProfileView, UserViewSet)
+                    DownloadShoppingCartView, EventsTicketView, FavoriteView,
+                    IngredientViewSet, LogoutView, PasswordChangeView,
+                    RecipeShortLinkView, RecipeViewSet, ShoppingCartView,
+                    SubscribeView, SubscriptionView, TagViewSet,
+                    UserAvatarView, UserViewSet)
 
 router = DefaultRouter()
 router.register(r'tags', TagViewSet, basename='tags')
@@ -19,10 +22,12 @@ urlpatterns = [
          CustomTokenObtainView.as_view(),
          name='token_obtain_pair'),
     path('auth/token/logout/', LogoutView.as_view(), name='logout'),
+    path('batch/', BatchView.as_view(), name='batch'),
+    path('events/ticket/', EventsTicketView.as_view(), name='events-ticket'),
 
     path('users/me/', CurrentUserView.as_view(), name='current_user'),
     path('users/<int:id>/',
-         UserProfileView.as_view(),
+         user_profile_view,
          name='user-profile-detail'),
     path('users/me/avatar/', UserAvatarView.as_view(), name='user-avatar'),
     path('users/set_password/',
@@ -46,6 +51,12 @@ urlpatterns = [
     path('recipes/<int:pk>/favorite/',
          FavoriteView.as_view(),
          name='favorite'),
+    path('recipes/', recipe_list_view, name='recipes-list-async'),
+    path('recipes/<int:pk>/',
+         recipe_detail_view,
+         name='recipes-detail-async'),
+    path('ingredients/', ingredient_list_view, name='ingredients-list-async'),
+    path('tags/', tag_list_view, name='tags-list-async'),
 
     path('', include(router.urls)),
 ]
@@ -0,0 +1,68 @@
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
+
+FAVORITES = 'favorites'
+SHOPPING_CART = 'shopping_cart'
+SUBSCRIPTIONS = 'subscriptions'
+
+SOURCES = {
+    FAVORITES: (Favorite, 'recipe_id'),
+    SHOPPING_CART: (ShoppingCart, 'recipe_id'),
+    SUBSCRIPTIONS: (Subscription, 'author_id'),
+}
+
+
+class ViewerSnapshot:
+    """
+    Избранное, корзина и подписки текущего пользователя на время запроса.
+    Каждое множество загружается одним запросом при первом обращении;
+    ответы, уже известные по отдельным id, запрос не вызывают.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._sets = {}
+        self._known = {kind: {} for kind in SOURCES}
+
+    def load(self, kind):
+        if kind not in self._sets:
+            if self.user.is_authenticated:
+                model, field = SOURCES[kind]
+                self._sets[kind] = set(model.objects.filter(
+                    user=self.user).values_list(field, flat=True))
+            else:
+                self._sets[kind] = set()
+        return self._sets[kind]
+
+    def has(self, kind, key):
+        if self.user.is_anonymous:
+            return False
+        if kind in self._sets:
+            return key in self._sets[kind]
+        known = self._known[kind].get(key)
+        if known is not None:
+            return known
+        return key in self.load(kind)
+
+    def remember(self, kind, answers):
+        """Запоминает ответы {id: bool}, уже полученные другим запросом."""
+        self._known[kind].update(answers)
+
+    def add(self, kind, key):
+        self._known[kind][key] = True
+        if kind in self._sets:
+            self._sets[kind].add(key)
+
+    def discard(self, kind, key):
+        self._known[kind][key] = False
+        if kind in self._sets:
+            self._sets[kind].discard(key)
+
+
+def get_viewer(request):
+    """Снимок пользователя запроса, общий для всех сериализаторов."""
+    http_request = getattr(request, '_request', request)
+    viewer = getattr(http_request, 'viewer', None)
+    if viewer is None or viewer.user != request.user:
+        viewer = http_request.viewer = ViewerSnapshot(request.user)
+    return viewer
@@ -1,7 +1,14 @@
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseRedirect
+from django.db import transaction
 from django.db.models import Sum
+from django.urls import reverse
+from django.utils.functional import cached_property
+from django.views import View
 from rest_framework import mixins, status, viewsets
 from rest_framework.authtoken.models import Token
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import ListAPIView, get_object_or_404
 from rest_framework.permissions import (AllowAny, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
@@ -10,18 +17,43 @@ from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
 
-from api.pagination import CustomPagination
+from api.catalog import get_catalog
+from api.conditional import (get_recipe_version, recipe_not_modified,
+                             remember_viewer_flags, set_recipe_validators)
+from api.fields import FieldSelection, optimize_recipe_queryset
+from api.events import issue_ticket, publish_subscription
+from api.filters import filter_recipe_queryset, order_recipe_queryset
+from api.pagination import CustomPagination, FeedPagination
 from api.permissions import IsAuthorOrReadOnly
+from api.relations import add_relation
+from api.search import fuzzy_ingredients
 from api.serializers import (IngredientSerializer, PasswordChangeSerializer,
-                             RecipeInputSerializer, RecipeOutputSerializer,
-                             SignUpSerializer, SubscriptionSerializer,
-                             TagSerializer, TokenObtainSerializer,
-                             UserAvatarSerializer, UserSerializer)
-from recipes.models import Ingredient, Recipe, ShoppingCart, Tag
-from users.models import User
-
-
-class UserViewSet(viewsets.GenericViewSet,
+                             RecipeInputSerializer, RecipeMinifiedSerializer,
+                             RecipeOutputSerializer, SignUpSerializer,
+                             SubscriptionSerializer, TagSerializer,
+                             TokenObtainSerializer, UserAvatarSerializer,
+                             UserSerializer)
+from api.viewer import FAVORITES, SHOPPING_CART, SUBSCRIPTIONS, get_viewer
+from foodgram_backend.db_routers import read_from
+from foodgram_backend.profiling import ProfiledViewMixin
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShortLink, Tag)
+from recipes.catalog_changes import changes_since
+from recipes.counters import recipe_views, short_link_hits
+from recipes.deletion import delete_recipes
+from recipes.feed import (backfill_timeline, drop_from_timeline,
+                          fan_out_recipe, feed_recipe_ids)
+from recipes.recipes_constatnts import CATALOG_CHANGES_LIMIT
+from recipes.shortlinks import get_short_code, resolve_short_code
+from users.models import Subscription, User
+
+# Поля, которые POST избранного, корзины и подписки возвращают в ответе.
+RECIPE_SHORT_FIELDS = ('id', 'name', 'image', 'cooking_time')
+AUTHOR_FIELDS = ('id', 'email', 'username', 'first_name', 'last_name',
+                 'avatar')
+
+
+class UserViewSet(ProfiledViewMixin, viewsets.GenericViewSet,
                   mixins.ListModelMixin,
                   mixins.CreateModelMixin):
     queryset = User.objects.all()
@@ -34,6 +66,9 @@ class UserViewSet(viewsets.GenericViewSet,
         'list': UserSerializer,
         'create': SignUpSerializer,
     }
+    throttle_scope_by_action = {
+        'create': 'auth',
+    }
 
     def get_permissions(self):
         return [
@@ -48,8 +83,9 @@ class UserViewSet(viewsets.GenericViewSet,
         return self.serializer_action_classes.get(self.action, UserSerializer)
 
 
-class CustomTokenObtainView(APIView):
+class CustomTokenObtainView(ProfiledViewMixin, APIView):
     permission_classes = [AllowAny]
+    throttle_scope = 'auth'
 
     def post(self, request):
         serializer = TokenObtainSerializer(
@@ -67,7 +103,7 @@ class CustomTokenObtainView(APIView):
             )
 
 
-class UserProfileView(APIView):
+class UserProfileView(ProfiledViewMixin, APIView):
     serializer_class = UserSerializer
     permission_classes = [AllowAny]
 
@@ -77,7 +113,7 @@ class UserProfileView(APIView):
         return Response(serializer.data)
 
 
-class CurrentUserView(APIView):
+class CurrentUserView(ProfiledViewMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
@@ -85,7 +121,7 @@ class CurrentUserView(APIView):
         return Response(serializer.data)
 
 
-class UserAvatarView(APIView):
+class UserAvatarView(ProfiledViewMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def put(self, request):
@@ -115,8 +151,9 @@ class UserAvatarView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class PasswordChangeView(APIView):
+class PasswordChangeView(ProfiledViewMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'auth'
 
     def post(self, request):
         serializer = PasswordChangeSerializer(data=request.data)
@@ -133,7 +170,7 @@ class PasswordChangeView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class LogoutView(APIView):
+class LogoutView(ProfiledViewMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
@@ -147,21 +184,78 @@ class LogoutView(APIView):
             )
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class CatalogViewMixin:
+    """list и retrieve отдают готовый JSON из сегмента каталога."""
+    catalog_section = None
+    search_param = None
+
+    def get_section(self):
+        return getattr(get_catalog(), self.catalog_section)
+
+    def list(self, request, *args, **kwargs):
+        section = self.get_section()
+        prefix = self.search_param and request.query_params.get(
+            self.search_param)
+        return HttpResponse(
+            section.search(prefix) if prefix else section.json,
+            content_type='application/json')
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            data = self.get_section().get(int(kwargs[self.lookup_field]))
+        except ValueError:
+            data = None
+        if data is None:
+            raise Http404
+        return HttpResponse(data, content_type='application/json')
+
+    @action(detail=False)
+    def changes(self, request):
+        """
+        Изменения после версии ?since=: текущие данные изменённых
+        объектов и id удалённых. С since=0 отдаётся весь каталог; пока
+        has_more, клиент запрашивает дальше с полученной version.
+        Журнал и объекты читаются из основной базы: с разных реплик
+        версия могла бы опередить данные, и клиент пропустил бы
+        изменения.
+        """
+        try:
+            since = int(request.query_params.get('since', 0))
+        except ValueError:
+            raise ValidationError({'since': 'Ожидается целое число.'})
+        with read_from(True):
+            version, ids, has_more = changes_since(
+                self.queryset.model, since, CATALOG_CHANGES_LIMIT)
+            changed = self.get_serializer(
+                self.get_queryset().filter(pk__in=ids), many=True).data
+        deleted = ids - {item['id'] for item in changed}
+        return Response({
+            'version': version,
+            'has_more': has_more,
+            'changed': changed,
+            'deleted': sorted(deleted),
+        })
+
+
+class IngredientViewSet(ProfiledViewMixin, CatalogViewMixin,
+                        ReadOnlyModelViewSet):
     permission_classes = [AllowAny]
     pagination_class = None
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    throttle_scope = 'search'
+    catalog_section = 'ingredients'
+    search_param = 'name'
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        name_filter = self.request.query_params.get('name')
-        if name_filter:
-            queryset = queryset.filter(name__istartswith=name_filter)
-        return queryset
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get(self.search_param)
+        if name and request.query_params.get('fuzzy') in ('1', 'true'):
+            return HttpResponse(fuzzy_ingredients(get_catalog(), name),
+                                content_type='application/json')
+        return super().list(request, *args, **kwargs)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ProfiledViewMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
 
@@ -171,7 +265,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return RecipeInputSerializer
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        transaction.on_commit(lambda: fan_out_recipe(recipe))
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -198,68 +293,123 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         serializer.save()
 
+    def perform_destroy(self, instance):
+        delete_recipes(Recipe.objects.filter(pk=instance.pk))
+
+    def retrieve(self, request, *args, **kwargs):
+        version = get_recipe_version(kwargs['pk'], request.user)
+        if version is None:
+            raise Http404
+        recipe_views.add(version['id'])
+        not_modified = recipe_not_modified(request, version)
+        if not_modified is not None:
+            return not_modified
+        remember_viewer_flags(request, version)
+        serializer = RecipeOutputSerializer(
+            self.get_object(), context=self.get_serializer_context())
+        return set_recipe_validators(Response(serializer.data), version)
+
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        paginator = FeedPagination()
+        limit = paginator.get_page_size(request)
+        ids = feed_recipe_ids(
+            request.user, paginator.get_cursor(request), limit)
+        next_cursor = ids[limit - 1] if len(ids) > limit else None
+        recipes = optimize_recipe_queryset(
+            Recipe.objects.filter(id__in=ids[:limit]),
+            self.field_selection
+        ).order_by('-id')
+        serializer = RecipeOutputSerializer(
+            recipes, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(
+            request, serializer.data, next_cursor)
+
+    @action(detail=True)
+    def similar(self, request, pk=None):
+        recipes = Recipe.objects.filter(
+            similar_for__recipe_id=pk).order_by('-similar_for__score')
+        if not recipes and not Recipe.objects.filter(pk=pk).exists():
+            raise Http404
+        serializer = RecipeMinifiedSerializer(
+            recipes, many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
+
+    @cached_property
+    def field_selection(self):
+        return FieldSelection.from_request(self.request)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['field_selection'] = self.field_selection
+        return context
+
     def get_queryset(self):
-        queryset = super().get_queryset().prefetch_related(
-            'tags').order_by('-id')
-        is_favorited = self.request.query_params.get('is_favorited')
-        is_in_shopping_cart = self.request.query_params.get(
-            'is_in_shopping_cart')
-        author = self.request.query_params.get('author')
-        tags = self.request.query_params.getlist('tags')
-
-        if self.request.user.is_authenticated:
-            if is_favorited == '1':
-                queryset = queryset.filter(
-                    favorited_by__user=self.request.user)
-            elif is_favorited == '0':
-                queryset = queryset.exclude(
-                    favorited_by__user=self.request.user)
-            if is_in_shopping_cart == '1':
-                queryset = queryset.filter(
-                    in_shopping_cart__user=self.request.user)
-            elif is_in_shopping_cart == '0':
-                queryset = queryset.exclude(
-                    in_shopping_cart__user=self.request.user)
-
-        if author:
-            queryset = queryset.filter(author__id=author)
-        if tags:
-            queryset = queryset.filter(tags__slug__in=tags).distinct()
-
-        return queryset
-
-
-class RecipeShortLinkView(APIView):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            queryset = optimize_recipe_queryset(
+                queryset, self.field_selection)
+        queryset = order_recipe_queryset(
+            queryset, self.request.query_params)
+        return filter_recipe_queryset(
+            queryset, self.request.query_params, self.request.user)
+
+
+class EventsTicketView(ProfiledViewMixin, APIView):
+    """
+    Билет для подключения к потоку событий /api/events/?ticket=. Если
+    поток ответил 204, билет просрочен: нужен новый.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        return Response({
+            'ticket': issue_ticket(request.auth),
+            'expires_in': settings.EVENTS_TICKET_SECONDS,
+        }, status=status.HTTP_201_CREATED)
+
+
+class RecipeShortLinkView(ProfiledViewMixin, APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, pk):
         try:
-            recipe = Recipe.objects.get(pk=pk)  # noqa: F841
-            short_link = request.build_absolute_uri(f'/api/recipes/{pk}/')
-            return Response(
-                {'short-link': short_link}, status=status.HTTP_200_OK)
+            code = get_short_code(pk)
         except Recipe.DoesNotExist:
             return Response(
                 {'detail': 'Объект не найден'},
                 status=status.HTTP_404_NOT_FOUND)
+        short_link = request.build_absolute_uri(
+            reverse('short-link', args=[code]))
+        return Response({'short-link': short_link}, status=status.HTTP_200_OK)
 
 
-class ShoppingCartView(APIView):
+class ShortLinkRedirectView(ProfiledViewMixin, View):
+
+    def get(self, request, code):
+        try:
+            recipe_id = resolve_short_code(code)
+        except ShortLink.DoesNotExist:
+            raise Http404
+        short_link_hits.add(recipe_id)
+        return HttpResponseRedirect(f'/recipes/{recipe_id}')
+
+
+class ShoppingCartView(ProfiledViewMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
-        try:
-            recipe = Recipe.objects.get(pk=pk)
-        except Recipe.DoesNotExist:
+        recipe, created = add_relation(
+            ShoppingCart, request.user, 'recipe', pk, RECIPE_SHORT_FIELDS)
+        if recipe is None:
             return Response(
                 {'error': 'Рецепт не найден.'},
                 status=status.HTTP_404_NOT_FOUND)
-
-        if request.user.shopping_cart.filter(recipe=recipe).exists():
+        if not created:
             return Response({'error': 'Рецепт уже добавлен в корзину.'},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        ShoppingCart.objects.create(user=request.user, recipe=recipe)
+        get_viewer(request).add(SHOPPING_CART, recipe.id)
         return Response(
             {'id': recipe.id, 'name': recipe.name,
              'image': request.build_absolute_uri(recipe.image.url),
@@ -277,12 +427,14 @@ class ShoppingCartView(APIView):
 
         deleted, _ = request.user.shopping_cart.filter(recipe=recipe).delete()
         if deleted:
+            get_viewer(request).discard(SHOPPING_CART, recipe.id)
             return Response({'detail': 'Рецепт удален из корзины'},
                             status=status.HTTP_204_NO_CONTENT)
 
 
-class DownloadShoppingCartView(APIView):
+class DownloadShoppingCartView(ProfiledViewMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'export'
 
     def get(self, request):
         ingredients = (
@@ -314,24 +466,23 @@ class DownloadShoppingCartView(APIView):
         return response
 
 
-class FavoriteView(APIView):
+class FavoriteView(ProfiledViewMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
-        try:
-            recipe = Recipe.objects.get(pk=pk)
-        except Recipe.DoesNotExist:
+        recipe, created = add_relation(
+            Favorite, request.user, 'recipe', pk, RECIPE_SHORT_FIELDS)
+        if recipe is None:
             return Response(
                 {'error': 'Рецепт не найден.'},
                 status=status.HTTP_404_NOT_FOUND)
-
-        if request.user.favorites.filter(recipe=recipe).exists():
+        if not created:
             return Response(
                 {'error': 'Рецепт уже добавлен в избранное.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        request.user.favorites.create(recipe=recipe)
+        get_viewer(request).add(FAVORITES, recipe.id)
         return Response(
             {'id': recipe.id, 'name': recipe.name,
              'image': request.build_absolute_uri(recipe.image.url),
@@ -350,6 +501,7 @@ class FavoriteView(APIView):
 
         deleted, _ = request.user.favorites.filter(recipe=recipe).delete()
         if deleted:
+            get_viewer(request).discard(FAVORITES, recipe.id)
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         return Response(
@@ -358,14 +510,16 @@ class FavoriteView(APIView):
         )
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(ProfiledViewMixin, CatalogViewMixin,
+                 ReadOnlyModelViewSet):
     pagination_class = None
     permission_classes = [AllowAny]
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    catalog_section = 'tags'
 
 
-class SubscriptionView(ListAPIView):
+class SubscriptionView(ProfiledViewMixin, ListAPIView):
     permission_classes = [IsAuthenticated]
     pagination_class = CustomPagination
     serializer_class = SubscriptionSerializer
@@ -374,26 +528,36 @@ class SubscriptionView(ListAPIView):
         return self.request.user.subscribed_users.all()
 
 
-class SubscribeView(APIView):
+class SubscribeView(ProfiledViewMixin, APIView):
     pagination_class = CustomPagination
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
-        try:
-            author = User.objects.get(pk=pk)
-        except User.DoesNotExist:
+        if pk == request.user.pk:
+            return Response(
+                {'error': 'Нельзя подписаться на самого себя.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        author, created = add_relation(
+            Subscription, request.user, 'author', pk, AUTHOR_FIELDS)
+        if author is None:
             return Response(
                 {'error': 'Пользователь не найден.'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        if not created:
+            return Response(
+                {'error': 'Вы уже подписаны на этого пользователя.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
+        get_viewer(request).add(SUBSCRIPTIONS, author.id)
+        backfill_timeline(request.user.id, author.id)
+        publish_subscription(request.user.id, author.id, True)
         serializer = SubscriptionSerializer(
-            data={'user': request.user.id, 'author': author.id},
+            Subscription(user=request.user, author=author),
             context={'request': request}
         )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, pk):
@@ -409,6 +573,9 @@ class SubscribeView(APIView):
             author=author).first()
         if subscription:
             subscription.delete()
+            get_viewer(request).discard(SUBSCRIPTIONS, author.id)
+            drop_from_timeline(request.user.id, author.id)
+            publish_subscription(request.user.id, author.id, False)
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         return Response(
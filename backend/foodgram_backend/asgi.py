@@ -13,4 +13,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from api.async_views import events_app  # noqa: E402
+
+# Поток событий держит соединение открытым часами. Django 3.2 не умеет
+# отдавать асинхронные потоковые ответы, поэтому этот путь обслуживает
+# обработчик ASGI без middleware и URLconf.
+EVENTS_PATH = '/api/events/'
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+        return await events_app(scope, receive, send)
+    return await django_application(scope, receive, send)
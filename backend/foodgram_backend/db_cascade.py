@@ -0,0 +1,62 @@
+from functools import partial
+
+from django.db import migrations, transaction
+
+ON_DELETE_CASCADE = ' ON DELETE CASCADE'
+
+
+def set_on_delete(app_label, fields, action, apps, schema_editor):
+    """
+    Пересоздаёт внешние ключи fields ((модель, поле), ...) с действием
+    action. Новые ключи добавляются NOT VALID в одной короткой
+    транзакции, а проверяются потом, каждый в своей: VALIDATE читает
+    таблицу под блокировкой, не мешающей записи. Поэтому миграция с
+    этой операцией должна быть atomic = False - в общей транзакции
+    блокировка от ADD CONSTRAINT держалась бы и на время проверки.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    quote = schema_editor.quote_name
+    validate = []
+    with transaction.atomic(using=connection.alias):
+        for model_name, field_name in fields:
+            model = apps.get_model(app_label, model_name)
+            field = model._meta.get_field(field_name)
+            table = model._meta.db_table
+            with connection.cursor() as cursor:
+                constraints = connection.introspection.get_constraints(
+                    cursor, table)
+            for name, info in constraints.items():
+                if (not info['foreign_key']
+                        or info['columns'] != [field.column]):
+                    continue
+                schema_editor.execute(
+                    f'ALTER TABLE {quote(table)} '
+                    f'DROP CONSTRAINT {quote(name)}, '
+                    f'ADD CONSTRAINT {quote(name)} '
+                    f'FOREIGN KEY ({quote(field.column)}) '
+                    f'REFERENCES {quote(field.related_model._meta.db_table)} '
+                    f'({quote(field.target_field.column)}){action} '
+                    'DEFERRABLE INITIALLY DEFERRED NOT VALID'
+                )
+                validate.append((table, name))
+    for table, name in validate:
+        with transaction.atomic(using=connection.alias):
+            schema_editor.execute(
+                f'ALTER TABLE {quote(table)} '
+                f'VALIDATE CONSTRAINT {quote(name)}'
+            )
+
+
+def db_cascade(app_label, fields):
+    """
+    Операция миграции: удаление строк fields при удалении связанного
+    объекта выполняет база. Django пересоздаёт внешний ключ без
+    ON DELETE при изменении поля, после такого AlterField операцию
+    нужно повторить. Миграция должна быть atomic = False.
+    """
+    return migrations.RunPython(
+        partial(set_on_delete, app_label, fields, ON_DELETE_CASCADE),
+        partial(set_on_delete, app_label, fields, ''),
+    )
@@ -0,0 +1,95 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+use_primary = ContextVar('use_primary', default=True)
+
+PRIMARY_ONLY_APPS = ('authtoken', 'sessions')
+
+
+@contextmanager
+def read_from(primary):
+    token = use_primary.set(primary)
+    try:
+        yield
+    finally:
+        use_primary.reset(token)
+
+
+class ReplicaPool:
+    """
+    Реплики из settings.DATABASES с периодической проверкой доступности
+    и отставания; недоступная реплика исключается до следующей проверки.
+    """
+
+    def __init__(self):
+        self._state = {}
+
+    @property
+    def aliases(self):
+        return [alias for alias in settings.DATABASES
+                if alias != DEFAULT_DB_ALIAS]
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        checked_at, healthy = self._state.get(alias, (None, False))
+        if (checked_at is None
+                or now - checked_at >= settings.REPLICA_HEALTH_CHECK_INTERVAL):
+            healthy = self._check(alias)
+            self._state[alias] = (now, healthy)
+        return healthy
+
+    def _check(self, alias):
+        connection = connections[alias]
+        try:
+            if connection.connection is not None and not (
+                    connection.is_usable()):
+                connection.close()
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT EXTRACT(EPOCH FROM '
+                    'now() - pg_last_xact_replay_timestamp())'
+                )
+                lag = cursor.fetchone()[0]
+        except DatabaseError:
+            connection.close()
+            return False
+        return lag is None or lag <= settings.REPLICA_MAX_LAG
+
+    def choose(self):
+        aliases = self.aliases
+        random.shuffle(aliases)
+        for alias in aliases:
+            if self.is_healthy(alias):
+                return alias
+        return DEFAULT_DB_ALIAS
+
+
+replicas = ReplicaPool()
+
+
+class ReplicaRouter:
+    """
+    Запись и чтение внутри транзакций идут в основную базу,
+    чтение в безопасных запросах без закрепления - в реплики.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (use_primary.get()
+                or model._meta.app_label in PRIMARY_ONLY_APPS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return replicas.choose()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,142 @@
+import asyncio
+import random
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+
+from .db_routers import read_from
+from .profiling import Profile, Sampler, current_profile, save_profile
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class SyncAndAsyncMiddleware:
+    """
+    Основа middleware, которое работает и в WSGI, и в ASGI без
+    перехода в поток: в асинхронной цепочке __call__ возвращает
+    корутину. Признак _is_coroutine нужен Django 3.2, чтобы отличить
+    асинхронный экземпляр от синхронного.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+
+class ReplicaPinningMiddleware(SyncAndAsyncMiddleware):
+    """
+    Безопасные запросы читают из реплик. После собственной записи
+    клиент на REPLICA_PIN_SECONDS закрепляется за основной базой,
+    чтобы не увидеть устаревшее состояние. Представления с
+    read_only = True (POST только ради тела запроса) считаются
+    безопасными.
+    """
+
+    def __call__(self, request):
+        if self.is_async:
+            return self._acall(request)
+        with read_from(self.use_primary(request)):
+            response = self.get_response(request)
+        return self.pin(request, response)
+
+    async def _acall(self, request):
+        with read_from(self.use_primary(request)):
+            response = await self.get_response(request)
+        return self.pin(request, response)
+
+    @staticmethod
+    def is_safe(request):
+        if request.method in SAFE_METHODS:
+            return True
+        try:
+            match = resolve(request.path_info,
+                            getattr(request, 'urlconf', None))
+        except Resolver404:
+            return False
+        view_class = getattr(match.func, 'view_class', None)
+        return getattr(view_class, 'read_only', False)
+
+    @classmethod
+    def use_primary(cls, request):
+        return (settings.REPLICA_PIN_COOKIE in request.COOKIES
+                or not cls.is_safe(request))
+
+    @classmethod
+    def pin(cls, request, response):
+        if response.status_code < 400 and not cls.is_safe(request):
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax'
+            )
+        return response
+
+
+class SamplingProfilerMiddleware(SyncAndAsyncMiddleware):
+    """
+    Включается PROFILER_ENABLED. Стеки снимаются у всех запросов, а
+    сохраняются (вместе с SQL) для каждого PROFILER_SAMPLE_RATE-го
+    в среднем и для всех медленнее PROFILER_SLOW_SECONDS. Под ASGI
+    в профиль идут стеки цикла событий, пока выполняется задача
+    запроса, и потоков, куда запрос выносит работу с базой и
+    синхронные представления (ProfiledViewMixin). Сводка - команда
+    profile_summary.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.sampler = Sampler(settings.PROFILER_INTERVAL)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self._acall(request)
+        profile = Profile(self.sampler)
+        token = current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            with profile.attach():
+                response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        self.finish(request, response, profile,
+                    time.perf_counter() - started)
+        return response
+
+    async def _acall(self, request):
+        profile = Profile(self.sampler)
+        token = current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            with profile.attach_task():
+                response = await self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        await sync_to_async(self.finish, thread_sensitive=False)(
+            request, response, profile, time.perf_counter() - started)
+        return response
+
+    def finish(self, request, response, profile, duration):
+        slow = duration >= settings.PROFILER_SLOW_SECONDS
+        if not slow and random.random() * settings.PROFILER_SAMPLE_RATE >= 1:
+            return
+        match = request.resolver_match
+        save_profile(settings.PROFILER_DIR, settings.PROFILER_MAX_FILES, {
+            'endpoint': f'{request.method} '
+                        f'{match.view_name if match else request.path}',
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'duration': duration,
+            'reason': 'slow' if slow else 'sampled',
+            'interval': self.sampler.interval,
+            'started_at': time.time() - duration,
+            'queries': profile.queries.queries,
+        }, profile.samples)
@@ -0,0 +1,58 @@
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+# Ниже этого порога оценка планировщика заменяется точным COUNT(*):
+# на маленьких таблицах он дешёвый, а оценка заметно врёт.
+EXACT_COUNT_THRESHOLD = 10000
+
+
+def table_estimate(model, using='default'):
+    """Оценка числа строк таблицы по статистике pg_class.reltuples."""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class '
+            'WHERE oid = %s::regclass',
+            [connection.ops.quote_name(model._meta.db_table)]
+        )
+        row = cursor.fetchone()
+    return row[0] if row else -1
+
+
+def query_estimate(queryset):
+    """Оценка числа строк запроса по плану EXPLAIN."""
+    connection = connections[queryset.db]
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def estimated_count(queryset):
+    """
+    Приблизительное число строк queryset для больших таблиц:
+    без фильтров - по reltuples, с фильтрами - по плану запроса.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.count()
+    if queryset.query.where:
+        estimate = query_estimate(queryset)
+    else:
+        estimate = table_estimate(queryset.model, queryset.db)
+    if estimate < EXACT_COUNT_THRESHOLD:
+        return queryset.count()
+    return estimate
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор админки без точного COUNT(*) по большим таблицам."""
+
+    @cached_property
+    def count(self):
+        return estimated_count(self.object_list)
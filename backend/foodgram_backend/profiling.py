@@ -0,0 +1,225 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+
+# Глубина стека в одном сэмпле; внешние кадры (сервер, middleware)
+# одинаковы у всех запросов и для поиска узких мест не нужны.
+MAX_STACK_DEPTH = 64
+PROFILE_SUFFIX = '.json'
+# Задача, которую цикл событий выполняет сейчас: {loop: task}. Читается
+# из потока профилировщика; current_task() работает только в потоке
+# самого цикла.
+RUNNING_TASKS = getattr(asyncio.tasks, '_current_tasks', {})
+
+
+def stack_key(frame):
+    """Стек потока как кортеж code-объектов от вершины вниз."""
+    codes = []
+    while frame is not None and len(codes) < MAX_STACK_DEPTH:
+        codes.append(frame.f_code)
+        frame = frame.f_back
+    return tuple(codes)
+
+
+def frame_name(code):
+    return f'{code.co_filename}:{code.co_firstlineno} {code.co_name}'
+
+
+class Sampler:
+    """
+    Статистический профилировщик: фоновый поток раз в interval снимает
+    стеки зарегистрированных потоков через sys._current_frames(). Сам
+    профилируемый код не инструментируется, поэтому накладные расходы
+    не зависят от числа вызовов функций.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._samples = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+
+    def add(self, thread_id, counter):
+        """Начинает снимать стеки потока в counter."""
+        with self._lock:
+            if thread_id in self._samples:
+                return False
+            self._samples[thread_id] = counter
+            self._start()
+            return True
+
+    def remove(self, thread_id):
+        with self._lock:
+            self._samples.pop(thread_id, None)
+
+    def add_task(self, task, counter):
+        """
+        Снимает стек потока цикла событий, только когда цикл выполняет
+        task: в одном цикле идут много запросов сразу, и стек потока
+        принадлежит той задаче, что сейчас работает.
+        """
+        with self._lock:
+            self._tasks[task] = (
+                threading.get_ident(), task.get_loop(), counter)
+            self._start()
+
+    def remove_task(self, task):
+        with self._lock:
+            self._tasks.pop(task, None)
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name='sampler', daemon=True)
+            self._thread.start()
+        self._wakeup.notify()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._samples and not self._tasks:
+                    self._wakeup.wait()
+                samples = list(self._samples.items())
+                tasks = list(self._tasks.items())
+            frames = sys._current_frames()
+            for thread_id, counter in samples:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    counter[stack_key(frame)] += 1
+            for task, (thread_id, loop, counter) in tasks:
+                frame = frames.get(thread_id)
+                if frame is not None and RUNNING_TASKS.get(loop) is task:
+                    counter[stack_key(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+class QueryLog:
+    """execute_wrapper: SQL запроса и время выполнения каждого."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'time': time.perf_counter() - started,
+            })
+
+
+class Profile:
+    """Сэмплы и SQL одного HTTP-запроса, из всех его потоков."""
+
+    def __init__(self, sampler):
+        self.sampler = sampler
+        self.samples = Counter()
+        self.queries = QueryLog()
+
+    @contextmanager
+    def attach(self):
+        """Профилирует текущий поток до выхода из блока."""
+        thread_id = threading.get_ident()
+        if not self.sampler.add(thread_id, self.samples):
+            # Поток уже в профиле: вложенный вызов, SQL не дублируется.
+            yield
+            return
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(self.queries))
+                yield
+        finally:
+            self.sampler.remove(thread_id)
+
+    @contextmanager
+    def attach_task(self):
+        """
+        Профилирует текущую задачу asyncio до выхода из блока. SQL
+        выполняется в потоках database_sync_to_async и попадает в
+        профиль через profiled_thread.
+        """
+        task = asyncio.current_task()
+        self.sampler.add_task(task, self.samples)
+        try:
+            yield
+        finally:
+            self.sampler.remove_task(task)
+
+
+current_profile = ContextVar('current_profile', default=None)
+
+
+@contextmanager
+def profiled_thread():
+    """
+    Для кода запроса, вынесенного в другой поток (sync_to_async
+    копирует контекст): его стеки и SQL попадают в профиль запроса.
+    """
+    profile = current_profile.get()
+    if profile is None:
+        yield
+        return
+    with profile.attach():
+        yield
+
+
+class ProfiledViewMixin:
+    """
+    Под ASGI Django выполняет синхронное представление в потоке
+    sync_to_async, а профилировщик снимает только поток цикла событий:
+    без этой примеси в профиле не было бы ни стеков, ни SQL.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with profiled_thread():
+            return super().dispatch(request, *args, **kwargs)
+
+
+def save_profile(directory, max_files, profile, samples):
+    """
+    Пишет профиль в directory и удаляет самые старые файлы сверх
+    max_files. Имена начинаются с времени в наносекундах, поэтому
+    сортировка по имени - сортировка по времени.
+    """
+    os.makedirs(directory, exist_ok=True)
+    profile['samples'] = [
+        [count, [frame_name(code) for code in stack]]
+        for stack, count in samples.most_common()
+    ]
+    name = f'{time.time_ns()}-{os.getpid()}{PROFILE_SUFFIX}'
+    temp_path = os.path.join(directory, f'.{name}')
+    with open(temp_path, 'w') as f:
+        json.dump(profile, f)
+    os.replace(temp_path, os.path.join(directory, name))
+    files = sorted(entry.name for entry in os.scandir(directory)
+                   if entry.name.endswith(PROFILE_SUFFIX)
+                   and not entry.name.startswith('.'))
+    for old in files[:max(0, len(files) - max_files)]:
+        try:
+            os.unlink(os.path.join(directory, old))
+        except FileNotFoundError:
+            pass
+
+
+def load_profiles(directory):
+    for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+        if entry.name.endswith(PROFILE_SUFFIX) and not (
+                entry.name.startswith('.')):
+            with open(entry.path) as f:
+                yield json.load(f)
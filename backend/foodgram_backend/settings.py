@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -31,6 +32,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodgram_backend.middleware.SamplingProfilerMiddleware',
+    'foodgram_backend.middleware.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -67,9 +70,29 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', 'db'),
         'PORT': os.getenv('DB_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
     }
 }
 
+for index, replica in enumerate(
+        filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(','))):
+    host, _, port = replica.partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'OPTIONS': {'connect_timeout': 2},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['foodgram_backend.db_routers.ReplicaRouter']
+
+REPLICA_PIN_COOKIE = 'primary_pin'
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+REPLICA_HEALTH_CHECK_INTERVAL = int(
+    os.getenv('REPLICA_HEALTH_CHECK_INTERVAL', 10))
+REPLICA_MAX_LAG = int(os.getenv('REPLICA_MAX_LAG', 30))
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -95,6 +118,10 @@ STATICFILES_DIRS = [
 
 STATIC_ROOT = os.path.join(BASE_DIR, '/backend_static')
 
+STATICFILES_STORAGE = (
+    'foodgram_backend.storage.CompressedManifestStaticFilesStorage')
+STATIC_COMPRESS_WORKERS = int(os.getenv('STATIC_COMPRESS_WORKERS', 0)) or None
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, '/app/media')
 
@@ -108,10 +135,70 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.TokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.CustomPagination',
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.ScopedBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'read': os.getenv('THROTTLE_READ_RATE', '600/min'),
+        'write': os.getenv('THROTTLE_WRITE_RATE', '120/min'),
+        'search': os.getenv('THROTTLE_SEARCH_RATE', '120/min'),
+        'export': os.getenv('THROTTLE_EXPORT_RATE', '10/min'),
+        'auth': os.getenv('THROTTLE_AUTH_RATE', '10/min'),
+    },
+    # Перед backend ровно один прокси (nginx), он задаёт X-Forwarded-For.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 1)),
 }
 
+SHARED_MEMORY_DIR = os.getenv(
+    'SHARED_MEMORY_DIR',
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir())
+
+THROTTLE_STATE_PATH = os.getenv(
+    'THROTTLE_STATE_PATH',
+    os.path.join(SHARED_MEMORY_DIR, 'foodgram-throttle'))
+THROTTLE_BUCKETS = int(os.getenv('THROTTLE_BUCKETS', 16384))
+
+CATALOG_SEGMENT_PATH = os.getenv(
+    'CATALOG_SEGMENT_PATH',
+    os.path.join(SHARED_MEMORY_DIR, 'foodgram-catalog'))
+CATALOG_CHECK_INTERVAL = float(os.getenv('CATALOG_CHECK_INTERVAL', 1))
+CATALOG_REBUILD_DELAY = float(os.getenv('CATALOG_REBUILD_DELAY', 1))
+
+TABLE_VERSIONS_PATH = os.getenv(
+    'TABLE_VERSIONS_PATH',
+    os.path.join(SHARED_MEMORY_DIR, 'foodgram-versions'))
+COUNT_CACHE_TIMEOUT = int(os.getenv('COUNT_CACHE_TIMEOUT', 300))
+
+EVENTS_HEARTBEAT = float(os.getenv('EVENTS_HEARTBEAT', 15))
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', 100))
+EVENTS_REPLAY_LIMIT = int(os.getenv('EVENTS_REPLAY_LIMIT', 100))
+EVENTS_TICKET_SECONDS = int(os.getenv('EVENTS_TICKET_SECONDS', 86400))
+
+SNAPSHOTS_ENABLED = os.getenv('SNAPSHOTS_ENABLED', 'False').lower() == 'true'
+SNAPSHOT_ROOT = os.getenv('SNAPSHOT_ROOT', '/app/snapshots')
+# Публичный адрес сайта: из него строятся абсолютные ссылки (картинки)
+# в снимках. Обязателен при SNAPSHOTS_ENABLED.
+SNAPSHOT_BASE_URL = os.getenv('SNAPSHOT_BASE_URL', '')
+SNAPSHOT_PAGES = int(os.getenv('SNAPSHOT_PAGES', 5))
+SNAPSHOT_RECIPES = int(os.getenv('SNAPSHOT_RECIPES', 100))
+SNAPSHOT_RENDER_DELAY = float(os.getenv('SNAPSHOT_RENDER_DELAY', 5))
+
 AUTH_USER_MODEL = 'users.User'
 
+SHORT_LINK_CACHE_SIZE = int(os.getenv('SHORT_LINK_CACHE_SIZE', 100000))
+SHORT_LINK_CACHE_TTL = int(os.getenv('SHORT_LINK_CACHE_TTL', 300))
+
+COUNTER_FLUSH_INTERVAL = int(os.getenv('COUNTER_FLUSH_INTERVAL', 10))
+COUNTER_FLUSH_SIZE = int(os.getenv('COUNTER_FLUSH_SIZE', 1000))
+
+PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', 'False').lower() == 'true'
+PROFILER_SAMPLE_RATE = int(os.getenv('PROFILER_SAMPLE_RATE', 100))
+PROFILER_SLOW_SECONDS = float(os.getenv('PROFILER_SLOW_SECONDS', 1))
+PROFILER_INTERVAL = float(os.getenv('PROFILER_INTERVAL', 0.005))
+PROFILER_DIR = os.getenv(
+    'PROFILER_DIR', os.path.join(tempfile.gettempdir(), 'foodgram-profiles'))
+PROFILER_MAX_FILES = int(os.getenv('PROFILER_MAX_FILES', 1000))
+
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 LOGGING = {
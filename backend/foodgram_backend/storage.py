@@ -0,0 +1,65 @@
+import gzip
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import brotli
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+COMPRESSED_EXTENSIONS = ('.css', '.js', '.html', '.json', '.map', '.svg',
+                         '.txt', '.xml', '.yml', '.yaml', '.ttf', '.eot')
+# Меньше этого сжатие не окупает лишний файл и заголовок.
+MIN_COMPRESS_SIZE = 256
+
+
+def compress_file(path):
+    """
+    Пишет рядом с файлом path.gz и path.br, если они меньше оригинала.
+    Выполняется в отдельном процессе.
+    """
+    with open(path, 'rb') as f:
+        content = f.read()
+    written = []
+    for suffix, compressed in (
+        ('.gz', gzip.compress(content, compresslevel=9, mtime=0)),
+        ('.br', brotli.compress(content, quality=11)),
+    ):
+        if len(compressed) >= len(content):
+            continue
+        with open(path + suffix, 'wb') as f:
+            f.write(compressed)
+        stat = os.stat(path)
+        os.utime(path + suffix, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Статика с хэшем содержимого в имени (манифест staticfiles.json) и
+    заранее сжатыми копиями .gz/.br для gzip_static/brotli_static.
+    Сжатие идёт после хэширования в пуле процессов.
+    """
+    # Пока collectstatic не запускался, отдаются имена без хэша, а не
+    # ошибка 500.
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        files = [
+            self.path(name) for name in sorted(names)
+            if name.endswith(COMPRESSED_EXTENSIONS)
+            and self.exists(name)
+            and self.size(name) >= MIN_COMPRESS_SIZE
+        ]
+        with ProcessPoolExecutor(settings.STATIC_COMPRESS_WORKERS) as pool:
+            list(pool.map(compress_file, files, chunksize=8))
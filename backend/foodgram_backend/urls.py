@@ -4,9 +4,16 @@ from django.contrib import admin
 from django.urls import include, path
 from django.views.generic import TemplateView
 
+from api.snapshots import SnapshotHitView
+from api.views import ShortLinkRedirectView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('s/<slug:code>', ShortLinkRedirectView.as_view(), name='short-link'),
+    # Доступен только из nginx (mirror), наружу не проксируется.
+    path('internal/recipe-views/', SnapshotHitView.as_view(),
+         name='snapshot-hits'),
     path(
         'api/docs/',
         TemplateView.as_view(template_name='redoc.html'),
@@ -0,0 +1,30 @@
+import os
+
+
+def when_ready(server):
+    # Мастер собирает сегмент каталога до запуска воркеров, чтобы они
+    # не строили его каждый сам при первом запросе. Если база ещё
+    # недоступна (контейнеры стартуют одновременно), сегмент соберёт
+    # первый запрос к каталогу (get_catalog), а gunicorn запустится.
+    import django
+
+    os.environ.setdefault(
+        'DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
+    django.setup()
+
+    from django.db import DatabaseError, connections
+
+    from api.catalog import build_catalog
+
+    try:
+        build_catalog()
+    except DatabaseError as error:
+        server.log.warning('Каталог не собран: %s', error)
+    finally:
+        connections.close_all()
+
+
+def worker_exit(server, worker):
+    from recipes.counters import flush_all
+
+    flush_all()
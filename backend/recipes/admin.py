@@ -1,8 +1,13 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.urls import reverse
 from django.utils.html import format_html
 
-from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                     ShoppingCart, Tag)
+from foodgram_backend.paginators import EstimatedCountPaginator
+from .deletion import delete_recipes, schedule_deletion
+from .models import (DeletionJob, Favorite, Ingredient, IngredientRecipe,
+                     Recipe, ShoppingCart, ShortLink, Tag)
 
 
 @admin.register(Tag)
@@ -21,6 +26,7 @@ class IngredientAdmin(admin.ModelAdmin):
 class IngredientRecipeInline(admin.TabularInline):
     model = IngredientRecipe
     extra = 1
+    autocomplete_fields = ('ingredient',)
 
 
 @admin.register(Recipe)
@@ -29,25 +35,78 @@ class RecipeAdmin(admin.ModelAdmin):
     search_fields = ('author__username', 'author__email', 'name')
     list_filter = ('tags',)
     inlines = (IngredientRecipeInline,)
+    actions = ('delete_in_background',)
     readonly_fields = ('added_to_favorites_count',)
+    autocomplete_fields = ('author',)
+    list_select_related = ('author',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # Подзапрос считается только для строк страницы, в отличие от
+        # JOIN с GROUP BY по всей таблице избранного.
+        favorites = Favorite.objects.filter(
+            recipe=OuterRef('pk')).order_by().values('recipe').annotate(
+            count=Count('*')).values('count')
+        return super().get_queryset(request).annotate(
+            favorites_count=Coalesce(Subquery(favorites), 0))
 
     def author_link(self, obj):
-        url = f"/admin/users/user/{obj.author.id}/change/"
+        url = reverse('admin:users_user_change', args=[obj.author_id])
         return format_html('<a href="{}">{}</a>', url, obj.author.username)
     author_link.short_description = 'Автор рецепта'
 
     def added_to_favorites_count(self, obj):
-        return obj.favorited_by.count()
+        return obj.favorites_count
     added_to_favorites_count.short_description = 'Добавлено в избранное'
 
+    def delete_model(self, request, obj):
+        delete_recipes(Recipe.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        delete_recipes(Recipe.objects.filter(
+            pk__in=[recipe.pk for recipe in queryset]))
+
+    @admin.action(description='Удалить в фоне')
+    def delete_in_background(self, request, queryset):
+        for recipe in queryset:
+            schedule_deletion(recipe)
+        self.message_user(
+            request, f'Рецептов поставлено в очередь на удаление: '
+                     f'{len(queryset)}.', messages.SUCCESS)
+
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe')
     search_fields = ('user__username', 'user__email', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe')
     search_fields = ('user__username', 'user__email', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(ShortLink)
+class ShortLinkAdmin(admin.ModelAdmin):
+    list_display = ('id', 'code', 'recipe', 'hits')
+    search_fields = ('code', 'recipe__name')
+    autocomplete_fields = ('recipe',)
+    list_select_related = ('recipe',)
+
+
+@admin.register(DeletionJob)
+class DeletionJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'object_id', 'rows_deleted',
+                    'created_at', 'finished_at')
+    list_filter = ('kind',)
+    readonly_fields = ('rows_deleted', 'created_at', 'finished_at')
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        from recipes import catalog_changes, shortlinks
+
+        catalog_changes.connect_signals()
+        shortlinks.connect_signals()
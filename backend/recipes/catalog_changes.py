@@ -0,0 +1,76 @@
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import CatalogChange, Ingredient, Tag
+
+CHANGE_KINDS = {
+    Ingredient: CatalogChange.Kind.INGREDIENT,
+    Tag: CatalogChange.Kind.TAG,
+}
+# Ключ pg_advisory_xact_lock. Записи журнала создаются по очереди и
+# видны в порядке id: клиент, получивший версию N, не пропустит
+# изменение с меньшим id, закоммиченное позже.
+CHANGES_LOCK_KEY = 4902
+
+RECORD_ALL_SQL = '''
+INSERT INTO {change} (kind, object_id, created_at)
+SELECT %s, {pk}, %s FROM {table} ORDER BY {pk}
+'''
+
+
+def lock_changes():
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)',
+                           [CHANGES_LOCK_KEY])
+
+
+def record_changes(model, ids):
+    with transaction.atomic():
+        lock_changes()
+        CatalogChange.objects.bulk_create(
+            CatalogChange(kind=CHANGE_KINDS[model], object_id=pk)
+            for pk in ids
+        )
+
+
+def record_all(model):
+    """Отмечает изменёнными все объекты model, например после загрузки."""
+    quote = connection.ops.quote_name
+    with transaction.atomic():
+        lock_changes()
+        with connection.cursor() as cursor:
+            cursor.execute(RECORD_ALL_SQL.format(
+                change=quote(CatalogChange._meta.db_table),
+                pk=quote(model._meta.pk.column),
+                table=quote(model._meta.db_table),
+            ), [CHANGE_KINDS[model], timezone.now()])
+
+
+def changes_since(model, since, limit):
+    """
+    Объекты model, изменённые после версии since, не больше limit
+    записей журнала. Возвращает новую версию, id объектов и признак
+    того, что в журнале есть ещё записи.
+    """
+    rows = list(CatalogChange.objects.filter(
+        kind=CHANGE_KINDS[model], id__gt=since
+    ).values_list('id', 'object_id')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    version = rows[-1][0] if rows else since
+    return version, {object_id for _, object_id in rows}, has_more
+
+
+def catalog_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record_changes(sender, [instance.pk])
+
+
+def connect_signals():
+    for model in CHANGE_KINDS:
+        post_save.connect(catalog_changed, sender=model,
+                          dispatch_uid=f'changes_save_{model.__name__}')
+        post_delete.connect(catalog_changed, sender=model,
+                            dispatch_uid=f'changes_delete_{model.__name__}')
@@ -0,0 +1,98 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.db import DatabaseError, connections, router
+
+from .models import Recipe, ShortLink
+
+logger = logging.getLogger(__name__)
+
+buffers = []
+
+
+def flush_all():
+    for buffer in buffers:
+        buffer.flush(wait=True)
+
+
+class CounterBuffer:
+    """
+    Копит приращения счётчика в памяти процесса и сбрасывает их
+    одним UPDATE ... FROM (VALUES ...) по таймеру или по размеру.
+    Запрос только добавляет ключ в очередь, запись идёт в фоновом потоке.
+    """
+
+    def __init__(self, model, field, key='id'):
+        self.model = model
+        self.field = field
+        self.key = key
+        self._pending = deque()
+        self._carry = Counter()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        buffers.append(self)
+
+    def add(self, key):
+        self._pending.append(key)
+        now = time.monotonic()
+        if ((len(self._pending) >= settings.COUNTER_FLUSH_SIZE
+                or now - self._last_flush >= settings.COUNTER_FLUSH_INTERVAL)
+                and not self._flush_lock.locked()):
+            self._last_flush = now
+            threading.Thread(
+                target=self._background_flush, daemon=True).start()
+
+    def _background_flush(self):
+        try:
+            self.flush()
+        finally:
+            connections.close_all()
+
+    def flush(self, wait=False):
+        if not self._flush_lock.acquire(blocking=wait):
+            return
+        try:
+            self._last_flush = time.monotonic()
+            counts, self._carry = self._carry, Counter()
+            while True:
+                try:
+                    counts[self._pending.popleft()] += 1
+                except IndexError:
+                    break
+            if not counts:
+                return
+            try:
+                self._write(counts)
+            except DatabaseError:
+                logger.exception('Не удалось сбросить счётчик %s.%s',
+                                 self.model._meta.label, self.field)
+                self._carry.update(counts)
+        finally:
+            self._flush_lock.release()
+
+    def _write(self, counts):
+        meta = self.model._meta
+        connection = connections[router.db_for_write(self.model)]
+        quote = connection.ops.quote_name
+        column = quote(meta.get_field(self.field).column)
+        key_column = quote(meta.get_field(self.key).column)
+        values = ', '.join(['(%s, %s)'] * len(counts))
+        params = [value for item in counts.items() for value in item]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {quote(meta.db_table)} AS t '
+                f'SET {column} = t.{column} + v.delta '
+                f'FROM (VALUES {values}) AS v(key, delta) '
+                f'WHERE t.{key_column} = v.key',
+                params
+            )
+
+
+recipe_views = CounterBuffer(Recipe, 'views_count')
+short_link_hits = CounterBuffer(ShortLink, 'hits', key='recipe')
+
+atexit.register(flush_all)
@@ -0,0 +1,134 @@
+import logging
+from functools import partial
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from users.models import Subscription, User
+from .models import (DeletionJob, Favorite, FeedCelebrity, IngredientRecipe,
+                     Recipe, ShoppingCart, ShortLink, SimilarRecipe,
+                     TimelineEntry)
+from .recipes_constatnts import DELETION_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Строки, которые база удалила бы каскадом вместе с рецептом или
+# пользователем. Фоновое удаление снимает их пачками заранее, чтобы
+# последний DELETE был коротким.
+RECIPE_RELATIONS = (
+    (IngredientRecipe, 'recipe'),
+    (Recipe.tags.through, 'recipe'),
+    (Favorite, 'recipe'),
+    (ShoppingCart, 'recipe'),
+    (TimelineEntry, 'recipe'),
+    (SimilarRecipe, 'recipe'),
+    (SimilarRecipe, 'similar'),
+    (ShortLink, 'recipe'),
+)
+USER_RELATIONS = (
+    (Favorite, 'user'),
+    (ShoppingCart, 'user'),
+    (TimelineEntry, 'user'),
+    (Subscription, 'user'),
+    (Subscription, 'author'),
+    (FeedCelebrity, 'author'),
+)
+
+
+def delete_media(names):
+    """Удаляет файлы; отсутствующие и недоступные пропускаются."""
+    for name in names:
+        try:
+            default_storage.delete(name)
+        except OSError:
+            logger.warning('Не удалось удалить файл %s', name, exc_info=True)
+
+
+def delete_recipes(queryset):
+    """
+    Удаляет рецепты; зависимые строки удаляет база, картинки - одной
+    пачкой после коммита.
+    """
+    images = [name for name in queryset.values_list('image', flat=True)
+              if name]
+    deleted = queryset.delete()[0]
+    transaction.on_commit(partial(delete_media, images))
+    return deleted
+
+
+def delete_in_chunks(queryset, chunk_size):
+    """Удаляет строки queryset пачками по chunk_size, каждая - отдельно."""
+    model = queryset.model
+    total = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return total
+        total += model.objects.filter(pk__in=ids).delete()[0]
+
+
+def delete_relations(relations, ids, chunk_size):
+    return sum(
+        delete_in_chunks(
+            model.objects.filter(**{f'{field}_id__in': ids}), chunk_size)
+        for model, field in relations
+    )
+
+
+def run_recipe_job(job, chunk_size):
+    ids = [job.object_id]
+    yield delete_relations(RECIPE_RELATIONS, ids, chunk_size)
+    yield delete_recipes(Recipe.objects.filter(pk__in=ids))
+
+
+def run_user_job(job, chunk_size):
+    recipes = Recipe.objects.filter(author_id=job.object_id)
+    while True:
+        ids = list(recipes.values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            break
+        yield delete_relations(RECIPE_RELATIONS, ids, chunk_size)
+        yield delete_recipes(Recipe.objects.filter(pk__in=ids))
+    yield delete_relations(USER_RELATIONS, [job.object_id], chunk_size)
+    user = User.objects.filter(pk=job.object_id).first()
+    if user is not None:
+        avatar = [user.avatar.name] if user.avatar else []
+        yield user.delete()[0]
+        transaction.on_commit(partial(delete_media, avatar))
+
+
+JOB_RUNNERS = {
+    DeletionJob.Kind.RECIPE: run_recipe_job,
+    DeletionJob.Kind.USER: run_user_job,
+}
+
+
+def run_deletion_job(job, chunk_size=DELETION_CHUNK_SIZE):
+    """
+    Выполняет задание по шагам, каждый шаг в своей транзакции. Шаги
+    повторяемы: прерванное задание можно запустить заново.
+    """
+    for deleted in JOB_RUNNERS[job.kind](job, chunk_size):
+        job.rows_deleted += deleted
+        job.save(update_fields=['rows_deleted'])
+    job.finished_at = timezone.now()
+    job.save(update_fields=['finished_at'])
+    return job
+
+
+def schedule_deletion(obj):
+    """
+    Ставит рецепт или пользователя в очередь на удаление. Пользователь
+    до удаления не может войти: учётная запись отключается, токен
+    удаляется.
+    """
+    if isinstance(obj, User):
+        kind = DeletionJob.Kind.USER
+        User.objects.filter(pk=obj.pk).update(is_active=False)
+        Token.objects.filter(user_id=obj.pk).delete()
+    else:
+        kind = DeletionJob.Kind.RECIPE
+    return DeletionJob.objects.get_or_create(
+        kind=kind, object_id=obj.pk, finished_at=None)[0]
@@ -0,0 +1,141 @@
+import gzip
+import json
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import groupby, islice
+
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import (DEFAULT_DB_ALIAS, connection, connections, models,
+                       transaction)
+
+from users.models import Subscription, User
+from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                     ShoppingCart, ShortLink, Tag)
+
+# Порядок важен: при загрузке модели идут друг за другом, поэтому
+# в памяти держится только текущая пачка строк. Файлы (image, avatar)
+# выгружаются путями относительно MEDIA_ROOT, сами файлы не копируются.
+# Остальные таблицы не выгружаются: ленты, похожие рецепты и журнал
+# изменений каталога строятся заново (build_similar_recipes,
+# import_catalog), задания на удаление к переносу не относятся.
+DUMP_MODELS = (
+    User, Tag, Ingredient, Recipe, ShortLink, Recipe.tags.through,
+    IngredientRecipe, Favorite, ShoppingCart, Subscription,
+)
+MODELS_BY_LABEL = {model._meta.label_lower: model for model in DUMP_MODELS}
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+class DumpEncoder(DjangoJSONEncoder):
+    """Сохраняет микросекунды: от updated_at зависят ETag рецептов."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def open_dump(path, mode, compress=False):
+    if 'r' in mode:
+        with open(path, 'rb') as f:
+            compress = f.read(2) == GZIP_MAGIC
+    if compress:
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def field_names(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def export_rows(chunk_size=2000):
+    """
+    Строки выгрузки по одной на объект, без загрузки таблиц в память.
+    Все таблицы читаются из основной базы в одной транзакции
+    REPEATABLE READ: запись во время выгрузки не оставит в файле
+    ссылок на строки, которых в нём нет.
+    """
+    encoder = DumpEncoder(ensure_ascii=False)
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute('SET TRANSACTION ISOLATION LEVEL '
+                           'REPEATABLE READ, READ ONLY')
+        for model in DUMP_MODELS:
+            label = model._meta.label_lower
+            rows = model.objects.using(DEFAULT_DB_ALIAS).order_by(
+                'pk').values(*field_names(model)).iterator(
+                    chunk_size=chunk_size)
+            for row in rows:
+                yield encoder.encode({'model': label, 'fields': row}) + '\n'
+
+
+def media_references(obj):
+    """Имена файлов, на которые ссылается объект."""
+    for field in obj._meta.concrete_fields:
+        if isinstance(field, models.FileField):
+            name = getattr(obj, field.attname).name
+            if name:
+                yield name
+
+
+@contextmanager
+def preserved_timestamps():
+    """Отключает auto_now/auto_now_add, чтобы сохранить даты из выгрузки."""
+    changed = []
+    for model in DUMP_MODELS:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(
+                    field, 'auto_now_add', False):
+                changed.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in changed:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def parse_lines(lines):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        try:
+            model = MODELS_BY_LABEL[record['model']]
+        except KeyError:
+            raise ValueError(
+                f'Строка {number}: неизвестная модель {record["model"]}')
+        yield model, record['fields']
+
+
+def import_rows(lines, batch_size=1000, ignore_conflicts=False,
+                on_media=None):
+    """
+    Загружает выгрузку пачками bulk_create с исходными pk в одной
+    транзакции с отложенной проверкой внешних ключей и сбрасывает
+    последовательности. Возвращает число строк по моделям.
+    """
+    counts = {}
+    with transaction.atomic(), preserved_timestamps():
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+        for model, records in groupby(parse_lines(lines),
+                                      key=lambda item: item[0]):
+            while True:
+                batch = [model(**fields) for _, fields in islice(
+                    records, batch_size)]
+                if not batch:
+                    break
+                if on_media is not None:
+                    for obj in batch:
+                        for name in media_references(obj):
+                            on_media(name)
+                model.objects.bulk_create(
+                    batch, ignore_conflicts=ignore_conflicts)
+                counts[model] = counts.get(model, 0) + len(batch)
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                    no_style(), list(counts)):
+                cursor.execute(sql)
+    return counts
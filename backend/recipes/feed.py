@@ -0,0 +1,85 @@
+from django.db import connection
+
+from users.models import Subscription
+from .models import FeedCelebrity, Recipe, TimelineEntry
+from .recipes_constatnts import FEED_BACKFILL_SIZE, FEED_FANOUT_LIMIT
+
+# Лента гибридная: рецепты обычных авторов при публикации раскладываются
+# в TimelineEntry подписчиков, рецепты авторов с большим числом
+# подписчиков (FeedCelebrity) подмешиваются при чтении. Отметка автора
+# как FeedCelebrity не снимается, иначе часть его рецептов пропала бы
+# из лент.
+
+FANOUT_SQL = '''
+INSERT INTO {timeline} (user_id, recipe_id)
+SELECT user_id, %s FROM {subscription} WHERE author_id = %s
+ON CONFLICT DO NOTHING
+'''
+
+BACKFILL_SQL = '''
+INSERT INTO {timeline} (user_id, recipe_id)
+SELECT %s, id FROM {recipe} WHERE author_id = %s
+ORDER BY id DESC LIMIT %s
+ON CONFLICT DO NOTHING
+'''
+
+
+def execute(sql, params):
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(
+            timeline=quote(TimelineEntry._meta.db_table),
+            subscription=quote(Subscription._meta.db_table),
+            recipe=quote(Recipe._meta.db_table),
+        ), params)
+        return cursor.rowcount
+
+
+def is_celebrity(author_id):
+    if FeedCelebrity.objects.filter(author_id=author_id).exists():
+        return True
+    followers = Subscription.objects.filter(
+        author_id=author_id)[:FEED_FANOUT_LIMIT].count()
+    if followers < FEED_FANOUT_LIMIT:
+        return False
+    FeedCelebrity.objects.get_or_create(author_id=author_id)
+    return True
+
+
+def fan_out_recipe(recipe):
+    """Раскладывает новый рецепт в ленты подписчиков автора."""
+    if is_celebrity(recipe.author_id):
+        return 0
+    return execute(FANOUT_SQL, [recipe.id, recipe.author_id])
+
+
+def backfill_timeline(user_id, author_id):
+    """Добавляет в ленту последние рецепты автора после подписки."""
+    if FeedCelebrity.objects.filter(author_id=author_id).exists():
+        return 0
+    return execute(BACKFILL_SQL, [user_id, author_id, FEED_BACKFILL_SIZE])
+
+
+def drop_from_timeline(user_id, author_id):
+    return TimelineEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id).delete()[0]
+
+
+def feed_recipe_ids(user, before, limit):
+    """
+    Страница ленты по ключу: id рецептов меньше before, по убыванию,
+    не больше limit + 1 штук (лишний признак следующей страницы).
+    """
+    timeline = TimelineEntry.objects.filter(user=user)
+    celebrities = Recipe.objects.filter(author__in=Subscription.objects.filter(
+        user=user,
+        author__in=FeedCelebrity.objects.values('author'),
+    ).values('author'))
+    if before is not None:
+        timeline = timeline.filter(recipe_id__lt=before)
+        celebrities = celebrities.filter(id__lt=before)
+    ids = set(timeline.order_by('-recipe_id').values_list(
+        'recipe_id', flat=True)[:limit + 1])
+    ids.update(celebrities.order_by('-id').values_list(
+        'id', flat=True)[:limit + 1])
+    return sorted(ids, reverse=True)[:limit + 1]
@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from recipes.models import SimilarRecipe
+from recipes.recipes_constatnts import SIMILAR_RECIPES_COUNT
+from recipes.similarity import (build_features,
+                                recipes_with_new_favorites_since,
+                                rows_to_refresh, store_neighbours)
+
+
+class Command(BaseCommand):
+    help = ('Расчёт похожих рецептов по совместному добавлению в избранное '
+            'и общим ингредиентам (--incremental - только для новых '
+            'рецептов, рецептов с новыми добавлениями в избранное с '
+            'прошлого запуска и рецептов, в чьих соседях они меняются)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--count', type=int,
+                            default=SIMILAR_RECIPES_COUNT)
+        parser.add_argument('--overlap-minutes', type=int, default=5)
+
+    def handle(self, *args, **options):
+        watermark = SimilarRecipe.objects.aggregate(
+            last=Max('computed_at'))['last']
+        recipe_ids, features = build_features()
+        if options['incremental'] and watermark is not None:
+            changed = np.fromiter(recipes_with_new_favorites_since(
+                watermark - timedelta(minutes=options['overlap_minutes'])
+            ).iterator(), dtype=np.int64)
+            rows = rows_to_refresh(
+                recipe_ids, features,
+                np.flatnonzero(np.isin(recipe_ids, changed)),
+                options['count'], options['batch_size'])
+        else:
+            rows = np.arange(len(recipe_ids))
+
+        stored = 0
+        for start in range(0, len(rows), options['batch_size']):
+            stored += store_neighbours(
+                recipe_ids, features,
+                rows[start:start + options['batch_size']], options['count'])
+        self.stdout.write(
+            f'Обработано рецептов: {len(rows)}, соседей: {stored}')
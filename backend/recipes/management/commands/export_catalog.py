@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from recipes.dump import export_rows, open_dump
+
+
+class Command(BaseCommand):
+    help = ('Потоковая выгрузка пользователей, тегов, ингредиентов, рецептов, '
+            'коротких ссылок, избранного, корзин и подписок в NDJSON '
+            '(--gzip - со сжатием) из согласованного снимка базы. Ленты, '
+            'похожие рецепты и журнал изменений каталога не выгружаются: '
+            'они строятся заново; задания на удаление не переносятся')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        compress = options['gzip'] or options['path'].endswith('.gz')
+        written = 0
+        with open_dump(options['path'], 'w', compress) as f:
+            for line in export_rows(options['chunk_size']):
+                f.write(line)
+                written += 1
+        self.stdout.write(f'Выгружено строк: {written}')
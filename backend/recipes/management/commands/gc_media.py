@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.media_gc import delete_orphans, orphans, referenced_paths
+from recipes.recipes_constatnts import (MEDIA_GC_BATCH_SIZE,
+                                        MEDIA_GC_ERROR_RATE,
+                                        MEDIA_GC_GRACE_HOURS,
+                                        MEDIA_GC_WORKERS)
+
+
+class Command(BaseCommand):
+    help = ('Удаляет из media картинки рецептов и аватары, на которые '
+            'нет ссылок в базе и которые старше --grace-hours '
+            '(--dry-run - только отчёт)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--grace-hours', type=float,
+                            default=MEDIA_GC_GRACE_HOURS)
+        parser.add_argument('--batch-size', type=int,
+                            default=MEDIA_GC_BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=MEDIA_GC_WORKERS)
+        parser.add_argument('--error-rate', type=float,
+                            default=MEDIA_GC_ERROR_RATE)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('Размер пачки и число потоков должны быть > 0')
+        if not 0 < options['error_rate'] < 1:
+            raise CommandError('--error-rate должен быть между 0 и 1')
+
+        # Порог берётся до чтения базы: файл, загруженный позже, моложе
+        # порога при любой длительности обхода.
+        older_than = time.time() - options['grace_hours'] * 3600
+        paths = referenced_paths(options['error_rate'])
+        files = orphans(paths, older_than)
+
+        if options['dry_run']:
+            count = size = 0
+            for name, file_size in files:
+                count += 1
+                size += file_size
+                if options['verbosity'] > 1:
+                    self.stdout.write(name)
+            self.stdout.write(
+                f'Будет удалено файлов: {count}, {size / 2 ** 20:.1f} МБ')
+            return
+
+        count, size = delete_orphans(
+            files, options['batch_size'], options['workers'])
+        self.stdout.write(
+            f'Удалено файлов: {count}, {size / 2 ** 20:.1f} МБ')
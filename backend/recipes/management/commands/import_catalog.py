@@ -0,0 +1,44 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from api.catalog import build_catalog
+from recipes.catalog_changes import CHANGE_KINDS, record_all
+from recipes.dump import import_rows, open_dump
+
+
+class Command(BaseCommand):
+    help = ('Загрузка выгрузки export_catalog с сохранением id '
+            '(--check-media - проверить наличие файлов в MEDIA_ROOT)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--ignore-conflicts', action='store_true')
+        parser.add_argument('--check-media', action='store_true')
+
+    def handle(self, *args, **options):
+        missing = []
+
+        def check_media(name):
+            if not default_storage.exists(name):
+                missing.append(name)
+
+        try:
+            with open_dump(options['path'], 'r') as f:
+                counts = import_rows(
+                    f, options['batch_size'], options['ignore_conflicts'],
+                    check_media if options['check_media'] else None)
+        except FileNotFoundError:
+            raise CommandError('Файл выгрузки не найден')
+        except (IntegrityError, ValueError) as error:
+            raise CommandError(f'Выгрузка не загружена: {error}')
+        # bulk_create не вызывает сигналы журнала изменений каталога.
+        for model in CHANGE_KINDS:
+            if counts.get(model):
+                record_all(model)
+        build_catalog()
+        for model, count in counts.items():
+            self.stdout.write(f'{model._meta.label}: {count}')
+        for name in missing:
+            self.stderr.write(f'Нет файла: {name}')
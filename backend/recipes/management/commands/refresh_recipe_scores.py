@@ -0,0 +1,37 @@
+from datetime import timedelta
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from recipes.models import Recipe
+from recipes.popularity import recipes_with_activity_since, refresh_scores
+
+
+class Command(BaseCommand):
+    help = ('Пересчёт рейтингов popular/trending для рецептов с новой '
+            'активностью с прошлого запуска (--full - для всех рецептов, '
+            'учитывает и удаления из избранного и корзины)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--overlap-minutes', type=int, default=5)
+
+    def handle(self, *args, **options):
+        watermark = Recipe.objects.aggregate(
+            last=Max('scores_updated_at'))['last']
+        if options['full'] or watermark is None:
+            recipe_ids = Recipe.objects.order_by('id').values_list(
+                'id', flat=True).iterator()
+        else:
+            recipe_ids = recipes_with_activity_since(
+                watermark - timedelta(minutes=options['overlap_minutes']))
+
+        updated = 0
+        while True:
+            batch = list(islice(recipe_ids, options['batch_size']))
+            if not batch:
+                break
+            updated += refresh_scores(batch)
+        self.stdout.write(f'Пересчитано рейтингов: {updated}')
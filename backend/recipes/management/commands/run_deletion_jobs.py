@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.deletion import run_deletion_job
+from recipes.models import DeletionJob
+from recipes.recipes_constatnts import DELETION_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = ('Выполняет поставленные в очередь удаления пользователей и '
+            'рецептов: зависимые строки удаляются пачками, файлы - после '
+            'каждой пачки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int,
+                            default=DELETION_CHUNK_SIZE)
+        parser.add_argument('--limit', type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('Размер пачки должен быть > 0')
+        jobs = DeletionJob.objects.filter(
+            finished_at__isnull=True).order_by('created_at')
+        for job in jobs[:options['limit']]:
+            run_deletion_job(job, options['chunk_size'])
+            self.stdout.write(f'{job}: удалено строк {job.rows_deleted}')
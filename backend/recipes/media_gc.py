@@ -0,0 +1,135 @@
+import hashlib
+import math
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.core.files.storage import default_storage
+
+from users.models import User
+from .models import Recipe
+
+# Поля с файлами в хранилище; сборщик смотрит только каталоги их
+# upload_to, остальное содержимое media не трогает.
+MEDIA_FIELDS = (
+    (Recipe, 'image'),
+    (User, 'avatar'),
+)
+
+
+class BloomFilter:
+    """
+    Множество путей с ограниченной памятью. Ложные срабатывания
+    возможны с вероятностью error_rate: такой файл просто не будет
+    удалён в этот раз.
+    """
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(
+            -capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        for index in range(self.hashes):
+            yield (first + index * second) % self.size
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(value))
+
+
+def referenced_paths(error_rate):
+    """Фильтр путей, на которые ссылаются записи в базе."""
+    querysets = [
+        model.objects.exclude(**{field: ''}).exclude(
+            **{f'{field}__isnull': True}).values_list(field, flat=True)
+        for model, field in MEDIA_FIELDS
+    ]
+    paths = BloomFilter(sum(qs.count() for qs in querysets), error_rate)
+    for queryset in querysets:
+        for name in queryset.iterator():
+            paths.add(name)
+    return paths
+
+
+def media_directories():
+    return sorted({
+        model._meta.get_field(field).upload_to.strip('/')
+        for model, field in MEDIA_FIELDS
+    })
+
+
+def walk(root, directory):
+    """Файлы каталога рекурсивно: (путь от root, размер, mtime)."""
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = os.scandir(os.path.join(root, current))
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                name = f'{current}/{entry.name}'
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(name)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    yield name, stat.st_size, stat.st_mtime
+
+
+def orphans(paths, older_than):
+    """Файлы без ссылок из базы, изменённые раньше older_than."""
+    root = default_storage.location
+    for directory in media_directories():
+        for name, size, mtime in walk(root, directory):
+            if mtime < older_than and name not in paths:
+                yield name, size
+
+
+def delete_batch(batch):
+    count = size = 0
+    for name, file_size in batch:
+        try:
+            os.unlink(default_storage.path(name))
+        except FileNotFoundError:
+            continue
+        count += 1
+        size += file_size
+    return count, size
+
+
+def delete_orphans(files, batch_size, workers):
+    """
+    Удаляет файлы пачками в workers потоков. В работе не больше
+    2 * workers пачек, поэтому память не растёт с числом файлов.
+    Возвращает число и общий размер удалённых файлов.
+    """
+    files = iter(files)
+    count = size = 0
+    pending = deque()
+
+    def collect():
+        nonlocal count, size
+        batch_count, batch_bytes = pending.popleft().result()
+        count += batch_count
+        size += batch_bytes
+
+    with ThreadPoolExecutor(workers) as executor:
+        for batch in iter(lambda: list(islice(files, batch_size)), []):
+            pending.append(executor.submit(delete_batch, batch))
+            if len(pending) >= 2 * workers:
+                collect()
+        while pending:
+            collect()
+    return count, size
@@ -0,0 +1,45 @@
+from django.db import DatabaseError, migrations, transaction
+
+INDEX_NAME = 'ingredient_name_trgm_idx'
+
+
+def create_trigram_index(apps, schema_editor):
+    # pg_trgm есть не во всех сборках Postgres: без него индекс не
+    # создаётся, и нечёткий поиск идёт по индексу в памяти процесса.
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT EXISTS(SELECT 1 FROM pg_available_extensions '
+            "WHERE name = 'pg_trgm')"
+        )
+        if not cursor.fetchone()[0]:
+            return
+        try:
+            with transaction.atomic(using=connection.alias):
+                cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        except DatabaseError:
+            return
+        table = schema_editor.quote_name(
+            apps.get_model('recipes', 'Ingredient')._meta.db_table)
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON {table} '
+            'USING gin (lower(name) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_similar_recipes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 3.2.16 on 2026-10-19 09:32
+
+from django.db import migrations, models
+from django.utils import timezone
+
+SEED_BATCH_SIZE = 1000
+
+
+def seed_changes(apps, schema_editor):
+    # Первая версия каталога - по записи на каждый существующий объект,
+    # чтобы ?since=0 отдавал весь каталог.
+    CatalogChange = apps.get_model('recipes', 'CatalogChange')
+    now = timezone.now()
+    for kind, model_name in (('tag', 'Tag'), ('ingredient', 'Ingredient')):
+        ids = apps.get_model('recipes', model_name).objects.order_by(
+            'pk').values_list('pk', flat=True)
+        CatalogChange.objects.bulk_create(
+            (CatalogChange(kind=kind, object_id=pk, created_at=now)
+             for pk in ids.iterator()),
+            batch_size=SEED_BATCH_SIZE
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_db_cascade'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('ingredient', 'Ингредиент'), ('tag', 'Тег')], max_length=16, verbose_name='Что изменено')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='ID объекта')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение каталога',
+                'verbose_name_plural': 'Изменения каталога',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='catalogchange',
+            index=models.Index(fields=['kind', 'id'], name='catalog_change_kind_id'),
+        ),
+        migrations.RunPython(seed_changes, migrations.RunPython.noop),
+    ]
@@ -2,11 +2,17 @@ from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 
 from users.models import User
-from .recipes_constatnts import (MAX_COOKING_TIME, MAX_MEASUREMENT_UNIT_LENGTH,
-                                 MAX_NAME_LENGTH, MAX_RECIPE_NAME_LENGTH,
+from .recipes_constatnts import (MAX_CATALOG_KIND_LENGTH, MAX_COOKING_TIME,
+                                 MAX_DELETION_KIND_LENGTH,
+                                 MAX_MEASUREMENT_UNIT_LENGTH, MAX_NAME_LENGTH,
+                                 MAX_RECIPE_NAME_LENGTH, MAX_SHORT_CODE_LENGTH,
                                  MAX_SLUG_LENGTH, MAX_TAG_NAME_LENGTH,
                                  MIN_COOKING_TIME)
 
+# Связи с пользователем и рецептом удаляет сама база (ON DELETE CASCADE,
+# миграции recipes 0014 и users 0004), поэтому в моделях DO_NOTHING:
+# Collector не загружает зависимые строки в память.
+
 
 class Ingredient(models.Model):
     name = models.CharField(
@@ -49,7 +55,7 @@ class Tag(models.Model):
 
 class Recipe(models.Model):
     author = models.ForeignKey(
-        User, on_delete=models.CASCADE,
+        User, on_delete=models.DO_NOTHING,
         related_name='recipes',
         verbose_name='Автор'
     )
@@ -73,8 +79,41 @@ class Recipe(models.Model):
         upload_to='recipes/image/',
         verbose_name='Картинка'
     )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+    views_count = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Просмотры'
+    )
+    popular_score = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Популярность'
+    )
+    trending_score = models.FloatField(
+        default=0,
+        editable=False,
+        verbose_name='Трендовость'
+    )
+    scores_updated_at = models.DateTimeField(
+        null=True,
+        editable=False,
+        verbose_name='Дата пересчёта рейтингов'
+    )
 
     class Meta:
+        indexes = [
+            models.Index(fields=['-popular_score', '-id'],
+                         name='recipe_popular_idx'),
+            models.Index(fields=['-trending_score', '-id'],
+                         name='recipe_trending_idx'),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -84,15 +123,20 @@ class Recipe(models.Model):
 
 class ShoppingCart(models.Model):
     user = models.ForeignKey(
-        User, on_delete=models.CASCADE,
+        User, on_delete=models.DO_NOTHING,
         related_name='shopping_cart',
         verbose_name='Пользователь'
     )
     recipe = models.ForeignKey(
-        Recipe, on_delete=models.CASCADE,
+        Recipe, on_delete=models.DO_NOTHING,
         related_name='in_shopping_cart',
         verbose_name='Рецепт'
     )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата добавления'
+    )
 
     class Meta:
         constraints = [
@@ -109,15 +153,20 @@ class ShoppingCart(models.Model):
 
 class Favorite(models.Model):
     user = models.ForeignKey(
-        User, on_delete=models.CASCADE,
+        User, on_delete=models.DO_NOTHING,
         related_name='favorites',
         verbose_name='Пользователь'
     )
     recipe = models.ForeignKey(
-        Recipe, on_delete=models.CASCADE,
+        Recipe, on_delete=models.DO_NOTHING,
         related_name='favorited_by',
         verbose_name='Рецепт'
     )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата добавления'
+    )
 
     class Meta:
         constraints = [
@@ -137,7 +186,7 @@ class IngredientRecipe(models.Model):
         verbose_name='Ингредиент'
     )
     recipe = models.ForeignKey(
-        Recipe, on_delete=models.CASCADE,
+        Recipe, on_delete=models.DO_NOTHING,
         verbose_name='Рецепт'
     )
     amount = models.PositiveSmallIntegerField(
@@ -156,3 +205,174 @@ class IngredientRecipe(models.Model):
 
     def __str__(self):
         return f'{self.ingredient}'
+
+
+class ShortLink(models.Model):
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.DO_NOTHING,
+        related_name='short_link',
+        verbose_name='Рецепт'
+    )
+    code = models.CharField(
+        max_length=MAX_SHORT_CODE_LENGTH,
+        unique=True,
+        verbose_name='Код'
+    )
+    hits = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Переходы'
+    )
+
+    class Meta:
+        verbose_name = 'Короткая ссылка'
+        verbose_name_plural = 'Короткие ссылки'
+
+    def __str__(self):
+        return self.code
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING,
+        related_name='timeline',
+        verbose_name='Пользователь'
+    )
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.DO_NOTHING,
+        related_name='timeline_entries',
+        verbose_name='Рецепт'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_timeline_entry'
+            )
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+
+    def __str__(self):
+        return f'{self.recipe}'
+
+
+class FeedCelebrity(models.Model):
+    author = models.OneToOneField(
+        User, on_delete=models.DO_NOTHING,
+        primary_key=True,
+        related_name='feed_celebrity',
+        verbose_name='Автор'
+    )
+
+    class Meta:
+        verbose_name = 'Автор без рассылки в ленты'
+        verbose_name_plural = 'Авторы без рассылки в ленты'
+
+    def __str__(self):
+        return f'{self.author}'
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.DO_NOTHING,
+        related_name='similar_recipes',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe, on_delete=models.DO_NOTHING,
+        related_name='similar_for',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(verbose_name='Сходство')
+    computed_at = models.DateTimeField(verbose_name='Дата расчёта')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique_similar_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['recipe', '-score'],
+                         name='similar_recipe_score_idx'),
+        ]
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+
+    def __str__(self):
+        return f'{self.recipe} - {self.similar}'
+
+
+class DeletionJob(models.Model):
+    class Kind(models.TextChoices):
+        USER = 'user', 'Пользователь'
+        RECIPE = 'recipe', 'Рецепт'
+
+    kind = models.CharField(
+        max_length=MAX_DELETION_KIND_LENGTH,
+        choices=Kind.choices,
+        verbose_name='Что удаляется'
+    )
+    object_id = models.PositiveBigIntegerField(verbose_name='ID объекта')
+    rows_deleted = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Удалено строк'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата постановки'
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Дата завершения'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'],
+                condition=models.Q(finished_at__isnull=True),
+                name='unique_pending_deletion'
+            )
+        ]
+        verbose_name = 'Фоновое удаление'
+        verbose_name_plural = 'Фоновые удаления'
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.object_id}'
+
+
+class CatalogChange(models.Model):
+    """
+    Журнал изменений ингредиентов и тегов: id записи - версия каталога
+    для GET /api/ingredients/changes/?since=. Сами данные не хранятся,
+    отдаётся текущее состояние объекта или его удаление.
+    """
+    class Kind(models.TextChoices):
+        INGREDIENT = 'ingredient', 'Ингредиент'
+        TAG = 'tag', 'Тег'
+
+    kind = models.CharField(
+        max_length=MAX_CATALOG_KIND_LENGTH,
+        choices=Kind.choices,
+        verbose_name='Что изменено'
+    )
+    object_id = models.PositiveBigIntegerField(verbose_name='ID объекта')
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата изменения'
+    )
+
+    class Meta:
+        ordering = ('id',)
+        indexes = [
+            models.Index(fields=['kind', 'id'], name='catalog_change_kind_id'),
+        ]
+        verbose_name = 'Изменение каталога'
+        verbose_name_plural = 'Изменения каталога'
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.object_id}'
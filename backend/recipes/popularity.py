@@ -0,0 +1,88 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+from django.db import connection
+from django.utils import timezone as django_timezone
+
+from .models import Favorite, Recipe, ShoppingCart
+from .recipes_constatnts import (FAVORITE_SCORE_WEIGHT,
+                                 POPULAR_HALF_LIFE_DAYS,
+                                 SHOPPING_CART_SCORE_WEIGHT,
+                                 TRENDING_HALF_LIFE_DAYS)
+
+# Рейтинг хранится как ln(sum(w * exp((t - SCORE_EPOCH) / tau))): вклад
+# события затухает со временем, но порядок рецептов от момента расчёта
+# не зависит, поэтому пересчитывать нужно только рецепты с новой
+# активностью.
+SCORE_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+SCORES_SQL = '''
+WITH activity AS (
+    SELECT recipe_id, created_at, ln(%(favorite_weight)s::float8) AS weight
+    FROM {favorite} WHERE recipe_id = ANY(%(ids)s)
+    UNION ALL
+    SELECT recipe_id, created_at, ln(%(cart_weight)s::float8)
+    FROM {cart} WHERE recipe_id = ANY(%(ids)s)
+), points AS (
+    SELECT recipe_id,
+           weight + EXTRACT(EPOCH FROM created_at - %(epoch)s)
+               / %(popular_tau)s AS popular,
+           weight + EXTRACT(EPOCH FROM created_at - %(epoch)s)
+               / %(trending_tau)s AS trending
+    FROM activity
+), peaks AS (
+    SELECT recipe_id, popular, trending,
+           max(popular) OVER recipe AS popular_peak,
+           max(trending) OVER recipe AS trending_peak
+    FROM points
+    WINDOW recipe AS (PARTITION BY recipe_id)
+), scores AS (
+    SELECT recipe_id,
+           max(popular_peak)
+               + ln(sum(exp(popular - popular_peak))) AS popular,
+           max(trending_peak)
+               + ln(sum(exp(trending - trending_peak))) AS trending
+    FROM peaks
+    GROUP BY recipe_id
+)
+UPDATE {recipe} AS r
+SET popular_score = COALESCE(s.popular, 0),
+    trending_score = COALESCE(s.trending, 0),
+    scores_updated_at = %(now)s
+FROM unnest(%(ids)s::bigint[]) AS target(id)
+LEFT JOIN scores AS s ON s.recipe_id = target.id
+WHERE r.id = target.id
+'''
+
+
+def half_life_tau(days):
+    return timedelta(days=days).total_seconds() / math.log(2)
+
+
+def refresh_scores(recipe_ids):
+    """Пересчитывает рейтинги рецептов одним запросом."""
+    sql = SCORES_SQL.format(
+        favorite=connection.ops.quote_name(Favorite._meta.db_table),
+        cart=connection.ops.quote_name(ShoppingCart._meta.db_table),
+        recipe=connection.ops.quote_name(Recipe._meta.db_table),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {
+            'ids': list(recipe_ids),
+            'favorite_weight': FAVORITE_SCORE_WEIGHT,
+            'cart_weight': SHOPPING_CART_SCORE_WEIGHT,
+            'epoch': SCORE_EPOCH,
+            'popular_tau': half_life_tau(POPULAR_HALF_LIFE_DAYS),
+            'trending_tau': half_life_tau(TRENDING_HALF_LIFE_DAYS),
+            'now': django_timezone.now(),
+        })
+        return cursor.rowcount
+
+
+def recipes_with_activity_since(since):
+    """id рецептов с добавлениями в избранное или корзину после since."""
+    favorites = Favorite.objects.filter(
+        created_at__gte=since).values_list('recipe_id', flat=True)
+    carts = ShoppingCart.objects.filter(
+        created_at__gte=since).values_list('recipe_id', flat=True)
+    return favorites.union(carts).iterator()
@@ -5,3 +5,21 @@ MAX_SLUG_LENGTH = 32
 MAX_RECIPE_NAME_LENGTH = 256
 MAX_COOKING_TIME = 32000
 MIN_COOKING_TIME = 1
+SHORT_CODE_LENGTH = 6
+MAX_SHORT_CODE_LENGTH = 16
+POPULAR_HALF_LIFE_DAYS = 30
+TRENDING_HALF_LIFE_DAYS = 2
+FAVORITE_SCORE_WEIGHT = 2
+SHOPPING_CART_SCORE_WEIGHT = 1
+FEED_FANOUT_LIMIT = 10000
+FEED_BACKFILL_SIZE = 50
+SIMILAR_RECIPES_COUNT = 10
+SIMILAR_FAVORITES_WEIGHT = 0.7
+MAX_DELETION_KIND_LENGTH = 16
+DELETION_CHUNK_SIZE = 1000
+MEDIA_GC_GRACE_HOURS = 24
+MEDIA_GC_BATCH_SIZE = 500
+MEDIA_GC_WORKERS = 8
+MEDIA_GC_ERROR_RATE = 0.001
+MAX_CATALOG_KIND_LENGTH = 16
+CATALOG_CHANGES_LIMIT = 1000
@@ -0,0 +1,76 @@
+import secrets
+import string
+import time
+import zlib
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_delete
+
+from .models import Recipe, ShortLink
+from .recipes_constatnts import SHORT_CODE_LENGTH
+
+BASE62 = string.digits + string.ascii_letters
+CODE_ATTEMPTS = 5
+
+
+def generate_code(length=SHORT_CODE_LENGTH):
+    return ''.join(secrets.choice(BASE62) for _ in range(length))
+
+
+def get_short_code(recipe_id):
+    """
+    Возвращает код рецепта, создавая его при первом обращении. Всё
+    читается из основной базы: на отстающей реплике нет только что
+    созданного рецепта или кода, который вставил параллельный запрос.
+    """
+    links = ShortLink.objects.using('default').filter(recipe_id=recipe_id)
+    code = links.values_list('code', flat=True).first()
+    if code is not None:
+        return code
+    if not Recipe.objects.using('default').filter(pk=recipe_id).exists():
+        raise Recipe.DoesNotExist
+    for _ in range(CODE_ATTEMPTS):
+        code = generate_code()
+        try:
+            with transaction.atomic():
+                ShortLink.objects.create(recipe_id=recipe_id, code=code)
+            return code
+        except IntegrityError:
+            existing = links.values_list('code', flat=True).first()
+            if existing is not None:
+                return existing
+    raise IntegrityError('Не удалось подобрать свободный короткий код.')
+
+
+def resolve_short_code(code):
+    """
+    Код -> id рецепта. Результат кэшируется в процессе не дольше
+    SHORT_LINK_CACHE_TTL; промахи не кэшируются: ShortLink.DoesNotExist
+    пробрасывается наружу. Период у каждого кода сдвинут на долю TTL
+    по его crc32, чтобы записи кэша не устаревали все разом.
+    """
+    ttl = settings.SHORT_LINK_CACHE_TTL
+    offset = zlib.crc32(code.encode()) / 2 ** 32 * ttl
+    return _resolve_short_code(code, int((time.monotonic() + offset) // ttl))
+
+
+@lru_cache(maxsize=settings.SHORT_LINK_CACHE_SIZE)
+def _resolve_short_code(code, period):
+    links = ShortLink.objects.values_list('recipe_id', flat=True)
+    try:
+        return links.get(code=code)
+    except ShortLink.DoesNotExist:
+        # Код мог появиться только что и ещё не дойти до реплики.
+        return links.using('default').get(code=code)
+
+
+def recipe_deleted(**kwargs):
+    # Ссылка удаляется вместе с рецептом каскадом базы.
+    transaction.on_commit(_resolve_short_code.cache_clear)
+
+
+def connect_signals():
+    post_delete.connect(recipe_deleted, sender=Recipe,
+                        dispatch_uid='shortlinks_recipe_delete')
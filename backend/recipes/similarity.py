@@ -0,0 +1,142 @@
+import math
+from array import array
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+from scipy import sparse
+
+from .models import Favorite, IngredientRecipe, Recipe, SimilarRecipe
+from .recipes_constatnts import SIMILAR_FAVORITES_WEIGHT
+
+# Признаки рецепта - строка из двух L2-нормированных блоков: пользователи,
+# добавившие его в избранное, и его ингредиенты. Блоки домножены на корни
+# весов, поэтому скалярное произведение строк равно взвешенной сумме
+# косинусов по избранному и по ингредиентам.
+
+
+def load_pairs(queryset, fields, chunk_size=10000):
+    """Читает пары id потоком в компактные массивы."""
+    left, right = array('q'), array('q')
+    for first, second in queryset.values_list(*fields).iterator(
+            chunk_size=chunk_size):
+        left.append(first)
+        right.append(second)
+    return (np.frombuffer(left, dtype=np.int64),
+            np.frombuffer(right, dtype=np.int64))
+
+
+def normalized_block(rows, values, n_rows, weight):
+    columns, columns_index = np.unique(values, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, columns_index)),
+        shape=(n_rows, len(columns)),
+    )
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1))).ravel()
+    norms[norms == 0] = 1
+    return sparse.diags(math.sqrt(weight) / norms) @ matrix
+
+
+def build_features():
+    """Возвращает отсортированные id рецептов и матрицу их признаков."""
+    recipe_ids = np.fromiter(
+        Recipe.objects.order_by('id').values_list('id', flat=True).iterator(),
+        dtype=np.int64,
+    )
+    if not len(recipe_ids):
+        return recipe_ids, sparse.csr_matrix((0, 0), dtype=np.float32)
+    favorite_recipes, users = load_pairs(
+        Favorite.objects.all(), ('recipe_id', 'user_id'))
+    ingredient_recipes, ingredients = load_pairs(
+        IngredientRecipe.objects.all(), ('recipe_id', 'ingredient_id'))
+    blocks = []
+    for recipes, values, weight in (
+        (favorite_recipes, users, SIMILAR_FAVORITES_WEIGHT),
+        (ingredient_recipes, ingredients, 1 - SIMILAR_FAVORITES_WEIGHT),
+    ):
+        rows = np.searchsorted(recipe_ids, recipes)
+        known = (rows < len(recipe_ids)) & (
+            recipe_ids[np.minimum(rows, len(recipe_ids) - 1)] == recipes)
+        blocks.append(normalized_block(
+            rows[known], values[known], len(recipe_ids), weight))
+    return recipe_ids, sparse.hstack(blocks, format='csr')
+
+
+def top_neighbours(features, rows, count):
+    """
+    Для строк rows возвращает (строка, сосед, сходство) по count лучших
+    соседей. Память ограничена размером произведения для этих строк.
+    """
+    scores = (features[rows] @ features.T).tocsr()
+    for position, row in enumerate(rows):
+        start, end = scores.indptr[position], scores.indptr[position + 1]
+        columns = scores.indices[start:end]
+        values = scores.data[start:end]
+        keep = (columns != row) & (values > 0)
+        columns, values = columns[keep], values[keep]
+        if len(values) > count:
+            best = np.argpartition(-values, count)[:count]
+            columns, values = columns[best], values[best]
+        for column, value in zip(columns, values):
+            yield row, column, float(value)
+
+
+def store_neighbours(recipe_ids, features, rows, count):
+    """Заменяет сохранённых соседей рецептов из rows новыми."""
+    computed_at = timezone.now()
+    neighbours = [
+        SimilarRecipe(
+            recipe_id=int(recipe_ids[row]),
+            similar_id=int(recipe_ids[column]),
+            score=score,
+            computed_at=computed_at,
+        )
+        for row, column, score in top_neighbours(features, rows, count)
+    ]
+    with transaction.atomic():
+        SimilarRecipe.objects.filter(
+            recipe_id__in=recipe_ids[rows].tolist()).delete()
+        SimilarRecipe.objects.bulk_create(neighbours)
+    return len(neighbours)
+
+
+def rows_to_refresh(recipe_ids, features, rows, count, batch_size):
+    """
+    Строки rows и строки рецептов, чьи сохранённые соседи устарели
+    из-за изменения rows. Меняется только строка признаков изменённого
+    рецепта, а сходство симметрично, поэтому пересчитать нужно рецепт,
+    в списке которого изменённый уже есть (сходство могло упасть), и
+    рецепт, сходство с которым теперь выше худшего в его списке (или
+    список неполон).
+    """
+    changed = recipe_ids[rows]
+    worst = np.zeros(len(recipe_ids), dtype=np.float32)
+    stored = SimilarRecipe.objects.values('recipe_id').annotate(
+        size=Count('id'), worst=Min('score'))
+    for item in stored.iterator():
+        index = np.searchsorted(recipe_ids, item['recipe_id'])
+        if (item['size'] >= count and index < len(recipe_ids)
+                and recipe_ids[index] == item['recipe_id']):
+            worst[index] = item['worst']
+    best = np.zeros(len(recipe_ids), dtype=np.float32)
+    for start in range(0, len(rows), batch_size):
+        scores = features[rows[start:start + batch_size]] @ features.T
+        best = np.maximum(best, scores.max(axis=0).toarray().ravel())
+    best[rows] = 0
+    holders = np.fromiter(SimilarRecipe.objects.filter(
+        similar_id__in=changed.tolist()
+    ).values_list('recipe_id', flat=True).iterator(), dtype=np.int64)
+    return np.union1d(rows, np.flatnonzero(
+        (best > worst) | np.isin(recipe_ids, holders)))
+
+
+def recipes_with_new_favorites_since(since):
+    """id рецептов, добавленных или попавших в избранное после since."""
+    favorites = Favorite.objects.filter(
+        created_at__gte=since).values_list('recipe_id', flat=True)
+    created = Recipe.objects.filter(
+        created_at__gte=since).values_list('id', flat=True)
+    return favorites.union(created)
@@ -0,0 +1,125 @@
+import shutil
+import tempfile
+
+from django.contrib.messages import get_messages
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from recipes.deletion import (delete_recipes, run_deletion_job,
+                              schedule_deletion)
+from recipes.models import (DeletionJob, Favorite, Ingredient,
+                            IngredientRecipe, Recipe, ShoppingCart,
+                            ShortLink, Tag)
+from users.models import Subscription, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class DeletionJobTests(TestCase):
+    """
+    Фоновое удаление: зависимые строки удаляются пачками и каскадом
+    базы, файлы - после коммита.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = self.create_user('author')
+        self.reader = self.create_user('reader')
+        self.author.avatar.save('author.png', ContentFile(b'avatar'))
+        self.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        self.ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='г')
+        self.recipes = [self.create_recipe(number) for number in range(3)]
+        Subscription.objects.create(user=self.reader, author=self.author)
+        Subscription.objects.create(user=self.author, author=self.reader)
+
+    @staticmethod
+    def create_user(name):
+        return User.objects.create_user(
+            email=f'{name}@example.com', username=name,
+            first_name='Имя', last_name='Фамилия', password='password')
+
+    def create_recipe(self, number):
+        recipe = Recipe(author=self.author, name=f'Рецепт {number}',
+                        text='Описание', cooking_time=10)
+        recipe.image.save(f'recipe{number}.png', ContentFile(b'image'))
+        recipe.tags.add(self.tag)
+        IngredientRecipe.objects.create(
+            recipe=recipe, ingredient=self.ingredient, amount=100)
+        Favorite.objects.create(user=self.reader, recipe=recipe)
+        ShoppingCart.objects.create(user=self.reader, recipe=recipe)
+        ShortLink.objects.create(recipe=recipe, code=f'code{number}')
+        return recipe
+
+    def run_job(self, obj):
+        job = schedule_deletion(obj)
+        with self.captureOnCommitCallbacks(execute=True):
+            run_deletion_job(job, chunk_size=2)
+        job.refresh_from_db()
+        self.assertIsNotNone(job.finished_at)
+        self.assertGreater(job.rows_deleted, 0)
+
+    def test_delete_recipe(self):
+        recipe, *others = self.recipes
+        image = recipe.image.name
+        self.run_job(recipe)
+
+        self.assertFalse(Recipe.objects.filter(pk=recipe.pk).exists())
+        for model in (IngredientRecipe, Favorite, ShoppingCart, ShortLink):
+            self.assertFalse(model.objects.filter(recipe=recipe.pk).exists())
+            self.assertEqual(
+                model.objects.filter(recipe__in=others).count(), len(others))
+        self.assertFalse(Recipe.tags.through.objects.filter(
+            recipe_id=recipe.pk).exists())
+        self.assertFalse(default_storage.exists(image))
+        self.assertTrue(default_storage.exists(others[0].image.name))
+
+    def test_database_cascade(self):
+        recipe = self.recipes[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            delete_recipes(Recipe.objects.filter(pk=recipe.pk))
+
+        for model in (IngredientRecipe, Favorite, ShoppingCart, ShortLink):
+            self.assertFalse(model.objects.filter(recipe=recipe.pk).exists())
+        self.assertFalse(default_storage.exists(recipe.image.name))
+
+    def test_delete_user(self):
+        files = [self.author.avatar.name] + [
+            recipe.image.name for recipe in self.recipes]
+        self.run_job(self.author)
+
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(Recipe.objects.exists())
+        for model in (IngredientRecipe, Favorite, ShoppingCart, ShortLink,
+                      Subscription):
+            self.assertFalse(model.objects.exists())
+        self.assertTrue(User.objects.filter(pk=self.reader.pk).exists())
+        for name in files:
+            self.assertFalse(default_storage.exists(name))
+
+    def test_admin_queues_user_deletion(self):
+        admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin',
+            first_name='Имя', last_name='Фамилия', password='password')
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse('admin:users_user_delete', args=[self.author.pk]),
+            {'post': 'yes'})
+
+        self.assertRedirects(response, reverse('admin:users_user_changelist'))
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)],
+            [f'Пользователь «{self.author}» отключён и поставлен в '
+             'очередь на удаление.'])
+        self.author.refresh_from_db()
+        self.assertFalse(self.author.is_active)
+        self.assertTrue(DeletionJob.objects.filter(
+            kind=DeletionJob.Kind.USER, object_id=self.author.pk,
+            finished_at=None).exists())
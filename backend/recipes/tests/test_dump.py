@@ -0,0 +1,40 @@
+from django.test import TransactionTestCase
+
+from recipes.dump import export_rows, import_rows
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShortLink, Tag)
+from users.models import User
+
+
+class DumpRoundTripTests(TransactionTestCase):
+    """Выгрузка и загрузка сохраняют id и короткие ссылки."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Имя', last_name='Фамилия', password='password')
+        tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='г')
+        self.recipe = Recipe.objects.create(
+            author=self.user, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/image/recipe.png')
+        self.recipe.tags.add(tag)
+        IngredientRecipe.objects.create(
+            recipe=self.recipe, ingredient=ingredient, amount=100)
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        ShortLink.objects.create(recipe=self.recipe, code='abc123')
+
+    def test_round_trip(self):
+        lines = list(export_rows())
+        for model in (ShortLink, Favorite, IngredientRecipe,
+                      Recipe.tags.through, Recipe, Ingredient, Tag, User):
+            model.objects.all().delete()
+
+        counts = import_rows(lines)
+
+        self.assertEqual(counts[ShortLink], 1)
+        self.assertEqual(
+            ShortLink.objects.get(code='abc123').recipe_id, self.recipe.id)
+        self.assertTrue(Favorite.objects.filter(
+            user_id=self.user.id, recipe_id=self.recipe.id).exists())
@@ -1,8 +1,17 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.options import IS_POPUP_VAR
+from django.contrib.admin.templatetags.admin_urls import add_preserved_filters
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.http import HttpResponseRedirect
+from django.urls import reverse
 
+from foodgram_backend.paginators import EstimatedCountPaginator
+from recipes.deletion import schedule_deletion
 from .models import Subscription, User
 
+DELETION_QUEUED_MESSAGE = (
+    'Пользователь «{}» отключён и поставлен в очередь на удаление.')
+
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -23,6 +32,47 @@ class UserAdmin(BaseUserAdmin):
     )
     readonly_fields = ('last_login', 'date_joined')
     ordering = ('email',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    actions = ('delete_in_background',)
+
+    # У активного автора тысячи строк в зависимых таблицах: удаление
+    # уходит в фон (run_deletion_jobs), пользователь сразу отключается.
+    # Стандартные сообщения «удалён успешно» заменены на сообщение об
+    # очереди, массовое удаление - действием delete_in_background.
+    def delete_model(self, request, obj):
+        schedule_deletion(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            schedule_deletion(user)
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def response_delete(self, request, obj_display, obj_id):
+        if IS_POPUP_VAR in request.POST:
+            return super().response_delete(request, obj_display, obj_id)
+        self.message_user(
+            request, DELETION_QUEUED_MESSAGE.format(obj_display),
+            messages.SUCCESS)
+        return HttpResponseRedirect(add_preserved_filters(
+            {'preserved_filters': self.get_preserved_filters(request),
+             'opts': self.model._meta},
+            reverse('admin:users_user_changelist',
+                    current_app=self.admin_site.name)))
+
+    @admin.action(description='Удалить в фоне',
+                  permissions=('delete',))
+    def delete_in_background(self, request, queryset):
+        self.delete_queryset(request, queryset)
+        for user in queryset:
+            self.message_user(
+                request, DELETION_QUEUED_MESSAGE.format(user),
+                messages.SUCCESS)
 
 
 @admin.register(Subscription)
@@ -32,3 +82,7 @@ class SubscriptionAdmin(admin.ModelAdmin):
         'user__email', 'author__email',
         'user__username', 'author__username'
     )
+    autocomplete_fields = ('user', 'author')
+    list_select_related = ('user', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
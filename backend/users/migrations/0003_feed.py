@@ -0,0 +1,37 @@
+# Generated by Django 3.2.16 on 2026-10-19 09:02
+
+from django.db import migrations, models
+
+# Несмотря на имя, к ленте подписок эта миграция не относится: в ней
+# накопившиеся расхождения моделей users с миграциями (verbose_name
+# полей и ordering подписок), которые makemigrations добавил вместе с
+# лентой. Схему базы она не меняет. Имя не исправлено, потому что
+# миграция уже применена, а от неё зависит 0004_db_cascade.
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_user_avatar'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='subscription',
+            options={'ordering': ('user',)},
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='first_name',
+            field=models.CharField(max_length=150, verbose_name='First name'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='last_name',
+            field=models.CharField(max_length=150, verbose_name='Last name'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='password',
+            field=models.CharField(max_length=150, verbose_name='Password'),
+        ),
+    ]
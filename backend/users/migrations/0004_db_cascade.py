@@ -0,0 +1,33 @@
+# Generated by Django 3.2.16 on 2026-10-19 09:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from foodgram_backend.db_cascade import db_cascade
+
+
+class Migration(migrations.Migration):
+    # Внешние ключи проверяются вне общей транзакции (db_cascade).
+    atomic = False
+
+    dependencies = [
+        ('users', '0003_feed'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='subscription',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='subscribers', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='subscription',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='subscribed_users', to=settings.AUTH_USER_MODEL),
+        ),
+        db_cascade('users', (
+            ('subscription', 'user'),
+            ('subscription', 'author'),
+        )),
+    ]
@@ -51,6 +51,13 @@ class User(AbstractUser):
         null=True
     )
 
+    # Меняется при любом сохранении, кроме save(update_fields=...) без
+    # этого поля: вход (last_login) версию автора в рецептах не меняет.
+    updated_at = models.DateTimeField(
+        'Updated at',
+        auto_now=True,
+    )
+
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
@@ -62,13 +69,15 @@ class User(AbstractUser):
 
 
 class Subscription(models.Model):
+    # Строки подписок удаляет база вместе с пользователем, см.
+    # миграцию 0004_db_cascade.
     user = models.ForeignKey(
-        User, on_delete=models.CASCADE,
+        User, on_delete=models.DO_NOTHING,
         related_name='subscribed_users'
     )
 
     author = models.ForeignKey(
-        User, on_delete=models.CASCADE,
+        User, on_delete=models.DO_NOTHING,
         related_name='subscribers'
     )
 